@@ -1,14 +1,14 @@
-from audiobookdl import Source, logging, args, output, __version__
+from audiobookdl import Source, logging, args, output, batch, metrics, profiling, __version__
 from .exceptions import AudiobookDLException, BookHasNoAudiobook, BookNotReleased
 from .utils.audiobook import Audiobook, Series
-from .output.download import download
 from .sources import find_compatible_source
 from .config import load_config, Config, SourceConfig
 
 import os
 import sys
+import threading
 from rich.prompt import Prompt
-from typing import List, Optional, Union
+from typing import List, Optional, Sized, Union
 
 
 def main() -> None:
@@ -24,50 +24,120 @@ def main() -> None:
     logging.ffmpeg_output = options.ffmpeg_output or options.debug
     logging.debug(f"audiobook-dl {__version__}", remove_styling=True)
     logging.debug(f"python {sys.version}", remove_styling=True)
-    urls = args.get_urls(options)
+    logging.progress_enabled = options.jobs <= 1
+    profiling.enabled = options.profile is not None
+    urls = [ normalize_url(url) for url in args.get_urls(options) ]
     if not urls:
         logging.simple_help()
         exit()
-    for url in urls:
-        try:
-            process_url(url, options, config)
-        except AudiobookDLException as e:
-            e.print()
-            if logging.debug_mode:
-                logging.print_traceback()
+    try:
+        results = batch.run(
+            urls,
+            options,
+            lambda url: create_source(url, options, config),
+            lambda url, source: process_result(url, source, options, config),
+        )
+    finally:
+        if options.profile:
+            profiling.write(options.profile, options.profile_format)
+    if options.metrics_textfile:
+        metrics.write_textfile(options.metrics_textfile)
+    if len(results) > 1:
+        counts = { status: 0 for status in (batch.SUCCESS, batch.SKIPPED, batch.FAILED) }
+        for result in results:
+            counts[result.status] += 1
+        logging.log(
+            f"Finished [yellow not bold]{len(results)}[/] urls: "
+            f"{counts[batch.SUCCESS]} downloaded, {counts[batch.SKIPPED]} skipped, {counts[batch.FAILED]} failed"
+        )
+
+
+def normalize_url(url: str) -> str:
+    """Add https scheme to url if it has no scheme"""
+    if not (url.startswith("http://") or url.startswith("https://")):
+        return f"https://{url}"
+    return url
 
 
-def process_url(url: str, options, config: Config):
+def create_source(url: str, options, config: Config) -> Source:
     """
-    Process url based on cli options.
-    Will by default download the audiobook the url is pointing to.
+    Create and authenticate source compatible with url
 
-    :param url: Url to process
+    :param url: Url the source is used for
     :param options: Cli options
     :param config: Configuration file options
+    :returns: Source ready to download url
     """
-    if not (url.startswith("http://") or url.startswith("https://")):
-        url = f"https://{url}"
     logging.log("Finding compatible source")
     source_class = find_compatible_source(url)
     source = source_class(options)
     if source.requires_authentication and not source.authenticated:
         authenticate(url, source, options, config)
-    # Running program
+    return source
+
+
+# Held while logging in again after a stored login was rejected, so workers
+# using the same source only log in once
+relogin_lock = threading.Lock()
+
+
+def process_result(url: str, source: Source, options, config: Config) -> bool:
+    """
+    Download result of url from source and process it based on cli options.
+    If the source rejects a login restored from storage, the stored login is
+    removed and the user is logged in again.
+
+    :param url: Url to process
+    :param source: Authenticated source compatible with url
+    :param options: Cli options
+    :param config: Configuration file options
+    :returns: False if the url was skipped
+    """
+    login_restored = source.login_restored
+    try:
+        return download_result(url, source, options)
+    except AudiobookDLException as e:
+        if not (login_restored and source.restored_login_rejected(e)):
+            raise
+    with relogin_lock:
+        # Another worker may already have logged in again
+        if source.login_restored:
+            source.forget_login()
+            login(url, source, options, config.sources.get(source.name), restore = False)
+    return download_result(url, source, options)
+
+
+def download_result(url: str, source: Source, options) -> bool:
+    """
+    Download result of url from source and process it based on cli options
+
+    :param url: Url to process
+    :param source: Authenticated source compatible with url
+    :param options: Cli options
+    :returns: False if the url was skipped
+    """
     logging.debug(f"Downloading result of [underline]{url}")
-    result = source.download(url)
-    logging.log("") # Empty line
-    if isinstance(result, Audiobook):
-        logging.log(f"Downloading [blue]{result.title}[/] from [magenta]{source.name}[/]")
-        process_audiobook(source, result, options)
-    elif isinstance(result, Series):
-        count = len(result.books)
-        logging.log(
-            f"Downloading [yellow not bold]{count}[/] books in [blue]{result.title}[/] from [magenta]{source.name}[/]")
+    with metrics.scope() as collector:
+        with metrics.phase("resolve"):
+            result = source.download(url)
+        logging.log("") # Empty line
+        if isinstance(result, Audiobook):
+            logging.log(f"Downloading [blue]{result.title}[/] from [magenta]{source.name}[/]")
+            try:
+                return process_audiobook(source, result, options)
+            finally:
+                write_metrics(result.title, collector, options)
+    if isinstance(result, Series):
+        if isinstance(result.books, Sized):
+            count = len(result.books)
+            logging.log(
+                f"Downloading [yellow not bold]{count}[/] books in [blue]{result.title}[/] from [magenta]{source.name}[/]")
+        else:
+            logging.log(f"Downloading books in [blue]{result.title}[/] from [magenta]{source.name}[/]")
+        processed = False
         for book in result.books:
             try:
-                audiobook = audiobook_from_series(source, book)
-                process_audiobook(source, audiobook, options)
+                processed = process_series_book(source, book, options) or processed
             except BookNotReleased:
                 logging.log(f"Skipped [blue]{book}[/] (not released)")
                 continue
@@ -81,6 +151,42 @@ def process_url(url: str, options, config: Config):
                 if logging.debug_mode:
                     logging.print_traceback()
                 continue
+        return processed
+    return False
+
+
+def process_series_book(source: Source, book, options) -> bool:
+    """
+    Download book in series and process it based on cli options
+
+    :param source: Source book originates from
+    :param book: Audiobook metadata or book id
+    :param options: Cli options
+    :returns: False if the book was skipped
+    """
+    title = str(book)
+    with metrics.scope() as collector:
+        try:
+            with metrics.phase("resolve"):
+                audiobook = audiobook_from_series(source, book)
+            title = audiobook.title
+            return process_audiobook(source, audiobook, options)
+        finally:
+            write_metrics(title, collector, options)
+
+
+def write_metrics(title: str, collector: metrics.Metrics, options) -> None:
+    """
+    Write measurements of a book to the files given in cli options
+
+    :param title: Title of book
+    :param collector: Measurements made while processing book
+    :param options: Cli options
+    """
+    if options.metrics_log:
+        metrics.write_summary(options.metrics_log, title, collector)
+    if options.metrics_textfile:
+        metrics.write_textfile(options.metrics_textfile)
 
 
 def get_cookie_path(options, config: Optional[SourceConfig]) -> Optional[str]:
@@ -119,7 +225,7 @@ def get_or_ask(attr: str, hidden: bool, options, config: Optional[SourceConfig])
     return value
 
 
-def login(url: str, source: Source, options, config: Optional[SourceConfig]):
+def login(url: str, source: Source, options, config: Optional[SourceConfig], restore: bool = True):
     """
     Login to source
 
@@ -127,11 +233,17 @@ def login(url: str, source: Source, options, config: Optional[SourceConfig]):
     :param source: Source the user is trying to login to
     :param options: Cli options
     :param config: Config file options
+    :param restore: Try to restore a stored login before logging in
     """
     login_data = {}
     for name in source.login_data:
-        hidden = name == "password"
-        login_data[name] = get_or_ask(name, hidden, options, config)
+        if name != "password":
+            login_data[name] = get_or_ask(name, False, options, config)
+    if restore and source.restore_login(**login_data):
+        source.ask_password = lambda: get_or_ask("password", True, options, config)
+        return
+    if "password" in source.login_data:
+        login_data["password"] = get_or_ask("password", True, options, config)
     source.login(url, **login_data)
 
 
@@ -168,21 +280,25 @@ def audiobook_from_series(source: Source, book) -> Audiobook:
     return source.download_from_id(book.id)
 
 
-def process_audiobook(source: Source, audiobook: Audiobook, options) -> None:
+def process_audiobook(source: Source, audiobook: Audiobook, options) -> bool:
     """
     Operate on audiobook based on cli arguments
 
     :param audiobook: Audiobook to operate on
     :param options: Cli options
-    :returns: Nothing
+    :returns: False if the audiobook was skipped
     """
     if options.print_output:
         print_output(audiobook, options)
     elif options.cover:
         download_cover(audiobook)
     else:
-        download(audiobook, options)
+        # Imported here so audio libraries are not loaded when only printing output
+        from .output.download import download
+        if not download(audiobook, options):
+            return False
         source.on_download_complete(audiobook)
+    return True
 
 
 
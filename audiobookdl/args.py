@@ -1,10 +1,21 @@
 import argparse
 import os
 import appdirs
-from audiobookdl import __version__
+from audiobookdl import __version__, profiling
 from typing import Any, List
 
 
+def positive_int(value: str) -> int:
+    """Argument type for integers larger than zero"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: '{value}'")
+    return number
+
+
 def parse_arguments() -> Any:
     parser = argparse.ArgumentParser(
         prog="audiobook-dl",
@@ -95,6 +106,48 @@ def parse_arguments() -> Any:
         dest="input_file",
         help="File with one url to download per line",
     )
+    parser.add_argument(
+        '--jobs',
+        '-j',
+        dest="jobs",
+        help="Number of urls to process at the same time (default: %(default)s)",
+        type=positive_int,
+        default=1,
+    )
+    parser.add_argument(
+        '--jobs-per-source',
+        dest="jobs_per_source",
+        help="Number of urls from the same source to process at the same time (default: %(default)s)",
+        type=positive_int,
+        default=1,
+    )
+    parser.add_argument(
+        '--result-log',
+        dest="result_log",
+        help="Append the result of every url to this file as json lines",
+    )
+    parser.add_argument(
+        '--metrics-log',
+        dest="metrics_log",
+        help="Append download measurements of every book to this file as json lines",
+    )
+    parser.add_argument(
+        '--metrics-textfile',
+        dest="metrics_textfile",
+        help="Write total download measurements to this file in the prometheus text format",
+    )
+    parser.add_argument(
+        '--profile',
+        dest="profile",
+        help="Record where time is spent and write it to this file",
+    )
+    parser.add_argument(
+        '--profile-format',
+        dest="profile_format",
+        choices=profiling.FORMATS,
+        default=profiling.TRACE_FORMAT,
+        help="Format of profile. 'trace' is Chrome trace event json and 'collapsed' is collapsed stacks for flame graphs",
+    )
     parser.add_argument(
         '--username',
         dest="username",
@@ -110,6 +163,12 @@ def parse_arguments() -> Any:
         dest="library",
         help="Library for source",
     )
+    parser.add_argument(
+        '--no-token-cache',
+        dest="no_token_cache",
+        help="Always log in instead of reusing stored logins",
+        action="store_true",
+    )
     parser.add_argument(
         '--skip-downloaded',
         dest="skip_downloaded",
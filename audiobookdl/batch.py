@@ -0,0 +1,199 @@
+from audiobookdl import Source, logging, profiling
+from .exceptions import AudiobookDLException, BookHasNoAudiobook, BookNotReleased
+from .sources import find_compatible_source
+
+import json
+import threading
+import time
+from attrs import define, asdict
+from itertools import chain, zip_longest
+from multiprocessing.pool import ThreadPool
+from rich.markup import escape
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
+from urllib.parse import urlsplit
+
+# Status of a processed url
+SUCCESS = "success"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+@define
+class UrlResult:
+    """Outcome of processing a single url"""
+    url: str
+    status: str
+    source: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.
+
+
+class ResultLog:
+    """Writes results as json lines. Can be used from multiple threads."""
+
+    def __init__(self, path: Optional[str]):
+        self._lock = threading.Lock()
+        self._file = open(path, "a") if path else None
+
+    def write(self, result: UrlResult) -> None:
+        if self._file is None:
+            return
+        with self._lock:
+            self._file.write(json.dumps(asdict(result)) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def run(
+        urls: Sequence[str],
+        options,
+        create_source: Callable[[str], Source],
+        process: Callable[[str, Source], bool],
+    ) -> List[UrlResult]:
+    """
+    Process urls using one authenticated source per source type.
+    Sources are created and authenticated one at a time before any url is
+    processed, so login prompts are not mixed with download output. Urls are
+    then processed by `options.jobs` workers with at most
+    `options.jobs_per_source` urls from the same source at a time.
+
+    :param urls: Urls to process
+    :param options: Cli options
+    :param create_source: Creates an authenticated source for url
+    :param process: Processes url with source. Returns False if url was skipped
+    :returns: Result of every url
+    """
+    result_log = ResultLog(options.result_log)
+    results: List[UrlResult] = []
+    try:
+        tasks = []
+        for url, source_or_error in create_sources(urls, create_source):
+            if isinstance(source_or_error, Source):
+                tasks.append((url, source_or_error))
+            else:
+                result = UrlResult(url, FAILED, error=source_or_error)
+                result_log.write(result)
+                results.append(result)
+        urls_by_source: Dict[Source, List[str]] = {}
+        for url, source in tasks:
+            urls_by_source.setdefault(source, []).append(url)
+        for source, source_urls in urls_by_source.items():
+            prefetch(source, source_urls)
+        limits = {
+            source: threading.Semaphore(options.jobs_per_source)
+            for source in urls_by_source
+        }
+        def run_task(task: Tuple[str, Source]) -> UrlResult:
+            url, source = task
+            with limits[source]:
+                return process_url(url, source, process)
+        if options.jobs > 1:
+            with ThreadPool(options.jobs) as pool:
+                for result in pool.imap_unordered(run_task, interleave_sources(tasks)):
+                    result_log.write(result)
+                    results.append(result)
+        else:
+            # Running in the main thread so downloads can be interrupted
+            for result in map(run_task, tasks):
+                result_log.write(result)
+                results.append(result)
+    finally:
+        result_log.close()
+    return results
+
+
+# Identifies urls that can share a source
+SourceKey = Tuple[Type[Source], Optional[str]]
+
+
+def source_key(source_class: Type[Source], url: str) -> SourceKey:
+    """Key of source used for url. Includes the hostname if logins are per hostname."""
+    if not source_class.login_per_hostname:
+        return source_class, None
+    hostname = urlsplit(url).hostname or ""
+    return source_class, hostname.removeprefix("www.")
+
+
+def create_sources(
+        urls: Sequence[str],
+        create_source: Callable[[str], Source]
+    ) -> Iterator[Tuple[str, Union[Source, str]]]:
+    """
+    Find source of every url and create one source per source type, or per
+    source type and hostname for sources with a login per hostname
+
+    :returns: Pairs of url and source, or url and error description if the
+    source could not be created
+    """
+    sources: Dict[SourceKey, Source] = {}
+    errors: Dict[SourceKey, str] = {}
+    for url in urls:
+        try:
+            source_class = find_compatible_source(url)
+        except AudiobookDLException as e:
+            e.print()
+            yield url, e.error_description
+            continue
+        key = source_key(source_class, url)
+        if key not in sources and key not in errors:
+            try:
+                sources[key] = create_source(url)
+            except AudiobookDLException as e:
+                e.print()
+                if logging.debug_mode:
+                    logging.print_traceback()
+                errors[key] = e.error_description
+        if key in errors:
+            yield url, errors[key]
+        else:
+            yield url, sources[key]
+
+
+def prefetch(source: Source, urls: List[str]) -> None:
+    """Let source prepare for downloading urls. Errors are reported when each url is processed."""
+    try:
+        source.prefetch(urls)
+    except AudiobookDLException as e:
+        logging.debug(f"Prefetching from {source.name} failed: {e.error_description}")
+
+
+def interleave_sources(tasks: List[Tuple[str, Source]]) -> List[Tuple[str, Source]]:
+    """
+    Order tasks so urls from different sources alternate. Workers are then
+    less likely to wait for the concurrency limit of a single source.
+    """
+    by_source: Dict[Source, List[Tuple[str, Source]]] = {}
+    for task in tasks:
+        by_source.setdefault(task[1], []).append(task)
+    rounds = zip_longest(*by_source.values())
+    return [ task for task in chain.from_iterable(rounds) if task is not None ]
+
+
+def process_url(url: str, source: Source, process: Callable[[str, Source], bool]) -> UrlResult:
+    """
+    Process url and catch errors, so a failing url does not stop the other
+    urls. `KeyboardInterrupt` is not caught.
+    """
+    start = time.perf_counter()
+    try:
+        with profiling.span("process_url", url=url, source=source.name):
+            processed = process(url, source)
+        status, error = (SUCCESS if processed else SKIPPED), None
+    except (BookNotReleased, BookHasNoAudiobook) as e:
+        e.print()
+        status, error = SKIPPED, e.error_description
+    except AudiobookDLException as e:
+        e.print()
+        if logging.debug_mode:
+            logging.print_traceback()
+        status, error = FAILED, e.error_description
+    except Exception as e:
+        # Unexpected errors, like a changed api or a dropped connection
+        logging.error(escape(f"Failed to process {url}: {type(e).__name__}: {e}"))
+        if logging.debug_mode:
+            logging.print_traceback()
+        status, error = FAILED, type(e).__name__
+    return UrlResult(url, status, source.name, error, time.perf_counter() - start)
@@ -64,3 +64,9 @@ class GenericAudiobookDLException(AudiobookDLException):
 
 class DownloadError(AudiobookDLException):
     error_description: str = "download_error"
+
+class DecryptionError(AudiobookDLException):
+    error_description: str = "decryption_error"
+
+class NotEnoughSpace(AudiobookDLException):
+    error_description: str = "not_enough_space"
@@ -10,6 +10,8 @@ import traceback
 debug_mode = False
 quiet_mode = False
 ffmpeg_output = False
+# Progress bars can't be shown for several books at once
+progress_enabled = True
 console = Console(stderr=True)
 DEBUG_PREFIX = render("[yellow bold]DEBUG[/]")
 INFO_PREFIX = render("[cyan bold] INFO[/]")
@@ -62,7 +64,7 @@ def simple_help() -> None:
     print_asset_file("assets/simple_help.txt")
 
 def progress(progress_format: List[Union[str, ProgressColumn]]) -> Progress:
-    return Progress(*progress_format, console=console)
+    return Progress(*progress_format, console=console, disable=not progress_enabled)
 
 def print_traceback() -> None:
     """Print traceback"""
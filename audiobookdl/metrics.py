@@ -0,0 +1,260 @@
+"""
+Counters, timers, and histograms for measuring downloads.
+
+Everything is recorded in `registry`, which holds totals for the whole run.
+Measurements are also recorded in every collector opened with `scope` on the
+current thread, which is used to create a summary for each book. Functions
+run in thread pools should be wrapped with `in_current_scope`, so their
+measurements reach the scopes of the thread that started them.
+"""
+import bisect
+import functools
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from audiobookdl import profiling
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None # type: ignore[assignment]
+
+T = TypeVar("T")
+Labels = Tuple[Tuple[str, str], ...]
+
+# Upper bounds of histogram buckets in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30.)
+# Prefix of metric names in prometheus output
+PROMETHEUS_PREFIX = "audiobookdl_"
+
+
+class Histogram:
+    """Counts of observed values in buckets"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # Last element counts values larger than every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": { str(bound): count for bound, count in zip(self.buckets, self.counts) },
+            "overflow": self.counts[-1],
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class Metrics:
+    """Thread-safe collection of counters and histograms"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def increment(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Export metrics as json serializable dictionary"""
+        with self._lock:
+            return {
+                "counters": [
+                    { "name": name, "labels": dict(labels), "value": value }
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    { "name": name, "labels": dict(labels), **histogram.as_dict() }
+                    for (name, labels), histogram in sorted(self.histograms.items(), key=lambda x: x[0])
+                ],
+                "download_speed": self._download_speed(),
+            }
+
+    def _download_speed(self) -> Dict[str, float]:
+        """Average download speed in bytes per second by host"""
+        speeds = {}
+        for (name, labels), seconds in self.counters.items():
+            if name == "download_seconds_total" and seconds > 0:
+                downloaded = self.counters.get(("download_bytes_total", labels), 0)
+                speeds[dict(labels).get("host", "")] = downloaded / seconds
+        return speeds
+
+    def prometheus_text(self) -> str:
+        """Export metrics in the prometheus text format"""
+        lines: List[str] = []
+        with self._lock:
+            # Series are sorted by name, so a type line is written before the
+            # first series of every metric
+            family = None
+            for (name, labels), value in sorted(self.counters.items()):
+                if name != family:
+                    family = name
+                    lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} counter")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}{_format_labels(labels)} {value}")
+            family = None
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda x: x[0]):
+                if name != family:
+                    family = name
+                    lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    bucket_labels = labels + (("le", str(bound)),)
+                    lines.append(f"{PROMETHEUS_PREFIX}{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                bucket_labels = labels + (("le", "+Inf"),)
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_bucket{_format_labels(bucket_labels)} {histogram.count}")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = [ (key, value.replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels ]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+# Totals for the whole run
+registry = Metrics()
+# Collectors opened with `scope` on each thread
+_local = threading.local()
+
+
+def _collectors() -> List[Metrics]:
+    return [ registry, *getattr(_local, "scopes", []) ]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Add `value` to counter"""
+    for collector in _collectors():
+        collector.increment(name, value, _labels(labels))
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Add value to histogram"""
+    for collector in _collectors():
+        collector.observe(name, value, _labels(labels))
+
+
+@contextmanager
+def timer(name: str, **labels: str) -> Iterator[None]:
+    """Add time spent in block to the counter `name`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        increment(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Measure time spent in a phase of downloading a book"""
+    with profiling.span(name), timer("phase_seconds_total", phase=name):
+        yield
+
+
+@contextmanager
+def scope() -> Iterator[Metrics]:
+    """Collect measurements made by the current thread inside the block"""
+    collector = Metrics()
+    scopes = getattr(_local, "scopes", [])
+    _local.scopes = [ *scopes, collector ]
+    try:
+        yield collector
+    finally:
+        _local.scopes = scopes
+
+
+def in_current_scope(function: Callable[..., T]) -> Callable[..., T]:
+    """
+    Make measurements of `function` reach the scopes of the current thread when
+    it runs in another thread. Spans of `function` are also nested in the spans
+    of the current thread.
+    """
+    scopes = getattr(_local, "scopes", [])
+    function = profiling.in_current_stack(function)
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs) -> T:
+        previous = getattr(_local, "scopes", [])
+        _local.scopes = scopes
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.scopes = previous
+    return wrapper
+
+
+def run_program(command: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    Run external program with `subprocess.run` and measure time spent in it.
+    Cpu time is measured as the cpu time used by all finished child
+    processes while the program runs, so it also includes other programs
+    finishing at the same time.
+    """
+    program = os.path.basename(command[0])
+    increment("subprocess_runs_total", program=program)
+    cpu_before = _children_cpu_time()
+    with profiling.span(program, command=" ".join(command)) as span_args, \
+            timer("subprocess_seconds_total", program=program):
+        result = subprocess.run(command, **kwargs)
+    if cpu_before is not None:
+        cpu_time = _children_cpu_time() - cpu_before # type: ignore[operator]
+        increment("subprocess_cpu_seconds_total", cpu_time, program=program)
+        span_args["cpu_seconds"] = cpu_time
+    span_args["returncode"] = result.returncode
+    return result
+
+
+def _children_cpu_time() -> Optional[float]:
+    """User and system cpu time used by finished child processes"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+_write_lock = threading.Lock()
+
+
+def write_summary(path: str, title: str, collector: Metrics) -> None:
+    """Append json summary of book to file"""
+    line = json.dumps({ "title": title, "time": time.time(), **collector.as_dict() })
+    with _write_lock, open(path, "a") as f:
+        f.write(line + "\n")
+
+
+def write_textfile(path: str) -> None:
+    """Write totals to a prometheus textfile. The file is replaced atomically."""
+    with _write_lock:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(registry.prometheus_text())
+        os.replace(tmp_path, path)
@@ -1,5 +1,6 @@
-from audiobookdl import AudiobookFile, Source, logging, Audiobook
-from audiobookdl.exceptions import UserNotAuthorized, NoFilesFound, DownloadError
+from audiobookdl import AudiobookFile, Source, logging, Audiobook, metrics, profiling
+from audiobookdl.exceptions import UserNotAuthorized, NoFilesFound, DownloadError, NotEnoughSpace
+from audiobookdl.utils import http
 from . import metadata, output, encryption
 
 import os
@@ -7,12 +8,13 @@ import shutil
 import time
 import requests
 from functools import partial
-from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union
+from typing import Any, List, Optional, Sequence, Tuple, Union
 from rich.progress import Progress, BarColumn, ProgressColumn, SpinnerColumn
 from rich.prompt import Confirm
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
 from math import log10
+from urllib.parse import urlsplit
 
 
 DOWNLOAD_PROGRESS: List[Union[str, ProgressColumn]] = [
@@ -24,14 +26,28 @@ DOWNLOAD_PROGRESS: List[Union[str, ProgressColumn]] = [
 
 # Per-file download attempts before giving up (retries transient network/TLS errors)
 DOWNLOAD_ATTEMPTS = 5
-
-
-def download(audiobook: Audiobook, options):
+# Status codes that mean a signed url has expired and should be requested again
+EXPIRED_URL_STATUS_CODES = (401, 403, 410)
+# Bytes read from the connection at a time
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Max number of files probed for their size before downloading. Books with
+# more files have their size estimated from an evenly spaced sample
+SIZE_PROBE_SAMPLE = 64
+SIZE_PROBE_THREADS = 16
+SIZE_PROBE_TIMEOUT = 10
+# Peak disk usage relative to downloaded files. Combining keeps the parts, their
+# remuxed copies, the concatenated stream, and the output at the same time.
+COMBINE_SPACE_FACTOR = 4
+CONVERT_SPACE_FACTOR = 2
+
+
+def download(audiobook: Audiobook, options) -> bool:
     """
     Download contents of audiobook
 
     :param audiobook: Audiobook to download
     :param options: Cli options
+    :returns: False if the audiobook was skipped
     """
     try:
         output_dir = output.gen_output_location(
@@ -39,7 +55,7 @@ def download(audiobook: Audiobook, options):
             audiobook.metadata,
             options.remove_chars
         )
-        download_audiobook(audiobook, output_dir, options)
+        return download_audiobook(audiobook, output_dir, options)
     except KeyboardInterrupt:
         logging.book_update("Stopped download")
         logging.book_update("Cleaning up files")
@@ -48,10 +64,16 @@ def download(audiobook: Audiobook, options):
             os.remove(filepath_tmp)
         else:
             shutil.rmtree(output_dir)
+        return False
 
 
-def download_audiobook(audiobook: Audiobook, output_dir: str, options):
-    """Download, convert, combine, and add metadata to files from `Audiobook` object"""
+@profiling.traced()
+def download_audiobook(audiobook: Audiobook, output_dir: str, options) -> bool:
+    """
+    Download, convert, combine, and add metadata to files from `Audiobook` object
+
+    :returns: False if the audiobook was skipped because it already exists
+    """
     # Check if file/dir exists and should be skipped
     if options.skip_downloaded:
         is_single_file = len(audiobook.files) == 1 or options.combine
@@ -62,29 +84,107 @@ def download_audiobook(audiobook: Audiobook, output_dir: str, options):
                 output_path = f"{output_dir}.{output_format}"
                 if os.path.exists(output_path):
                     logging.log(f"Skipping [blue]{audiobook.title}[/], file already exists.")
-                    return
+                    return False
         elif os.path.isdir(output_dir):  # multiple files, check for directory
             logging.log(f"Skipping [blue]{audiobook.title}[/], directory already exists.")
-            return
+            return False
 
+    check_free_space(audiobook, output_dir, options)
     # Downloading files
-    filepaths = download_files_with_cli_output(audiobook, output_dir)
+    with metrics.phase("download"):
+        filepaths = download_files_with_cli_output(audiobook, output_dir)
     # Converting files
     current_format, output_format = get_output_audio_format(options.output_format, filepaths)
     # Combine files
     if options.combine and len(filepaths) > 1:
         logging.book_update("Combining files")
         output_path = f"{output_dir}.{current_format}"
-        output.combine_audiofiles(filepaths, output_dir, output_path)
+        with metrics.phase("combine"):
+            output.combine_audiofiles(filepaths, output_dir, output_path)
         filepaths = [output_path]
     if current_format != output_format:
         logging.book_update("Converting files")
-        filepaths = output.convert_output(filepaths, output_format)
+        with metrics.phase("convert"):
+            filepaths = output.convert_output(filepaths, output_format)
     # Add metadata
-    if len(filepaths) == 1:
-        add_metadata_to_file(audiobook, filepaths[0], options)
+    with metrics.phase("tag"):
+        if len(filepaths) == 1:
+            add_metadata_to_file(audiobook, filepaths[0], options)
+        else:
+            add_metadata_to_dir(audiobook, filepaths, output_dir, options)
+    return True
+
+
+def check_free_space(audiobook: Audiobook, output_dir: str, options):
+    """
+    Raise `NotEnoughSpace` if the estimated disk usage of downloading,
+    combining, and converting `audiobook` is larger than the free space.
+    Nothing is checked if the size of the files can't be found.
+
+    :param audiobook: Audiobook to download
+    :param output_dir: Output directory where files are downloaded to
+    :param options: Cli options
+    """
+    download_size = estimate_download_size(audiobook)
+    if download_size is None:
+        return
+    output_format = options.output_format or (audiobook.files[0].ext if audiobook.files else None)
+    if options.combine and len(audiobook.files) > 1:
+        factor = COMBINE_SPACE_FACTOR
+    elif audiobook.files and output_format != audiobook.files[0].ext:
+        factor = CONVERT_SPACE_FACTOR
+    else:
+        factor = 1
+    required = download_size * factor
+    # Output directory does not exist before downloading
+    existing_dir = os.path.abspath(output_dir)
+    while not os.path.isdir(existing_dir):
+        existing_dir = os.path.dirname(existing_dir)
+    free = shutil.disk_usage(existing_dir).free
+    logging.debug(f"Estimated disk usage: {required} bytes, free space: {free} bytes")
+    if required > free:
+        raise NotEnoughSpace(
+            title = audiobook.title,
+            path = existing_dir,
+            required = required // 1_000_000,
+            free = free // 1_000_000,
+        )
+
+
+def estimate_download_size(audiobook: Audiobook) -> Optional[int]:
+    """
+    Estimate total size of files in audiobook with concurrent HEAD requests.
+    Files with urls that are resolved right before download are not probed.
+
+    :param audiobook: Audiobook to estimate size of
+    :returns: Estimated size in bytes or `None` if it is unknown
+    """
+    files = [ file for file in audiobook.files if file.url_resolver is None ]
+    if not files:
+        return None
+    if len(files) > SIZE_PROBE_SAMPLE:
+        step = len(files) / SIZE_PROBE_SAMPLE
+        sample = [ files[int(i * step)] for i in range(SIZE_PROBE_SAMPLE) ]
     else:
-        add_metadata_to_dir(audiobook, filepaths, output_dir, options)
+        sample = files
+    with ThreadPool(min(len(sample), SIZE_PROBE_THREADS)) as pool:
+        probe = metrics.in_current_scope(partial(probe_file_size, audiobook.session))
+        sizes = [ size for size in pool.map(probe, sample) if size is not None ]
+    if not sizes:
+        return None
+    return int(sum(sizes) / len(sizes) * len(audiobook.files))
+
+
+def probe_file_size(session: requests.Session, file: AudiobookFile) -> Optional[int]:
+    """Get size of file from Content-Length of HEAD request"""
+    try:
+        response = session.head(file.url, headers=file.headers, allow_redirects=True, timeout=SIZE_PROBE_TIMEOUT)
+    except requests.exceptions.RequestException:
+        return None
+    content_length = response.headers.get("Content-length")
+    if not response.ok or content_length is None or not content_length.isdigit():
+        return None
+    return int(content_length)
 
 
 def add_metadata_to_file(audiobook: Audiobook, filepath: str, options):
@@ -95,38 +195,30 @@ def add_metadata_to_file(audiobook: Audiobook, filepath: str, options):
     :param filepath: Filepath of output file
     :options: Cli options
     """
-    # General metadata
     logging.book_update("Adding metadata")
-    metadata.add_metadata(filepath, audiobook.metadata)
+    chapters = audiobook.chapters if not options.no_chapters else None
+    metadata.write_metadata(filepath, audiobook.metadata, chapters, audiobook.cover)
     if options.write_json_metadata:
-        with open(f"{filepath}.json", "w") as f:
-            f.write(audiobook.metadata.as_json())
-    # Chapters
-    if audiobook.chapters and not options.no_chapters:
-        logging.book_update("Adding chapters")
-        metadata.add_chapters(filepath, audiobook.chapters)
-    # Cover
-    if audiobook.cover:
-        logging.book_update("Embedding cover")
-        metadata.embed_cover(filepath, audiobook.cover)
+        with open(f"{filepath}.json", "wb") as f:
+            f.write(audiobook.metadata.snapshot().json)
 
 
-def add_metadata_to_dir(audiobook: Audiobook, filepaths: Iterable[str], output_dir: str, options):
+def add_metadata_to_dir(audiobook: Audiobook, filepaths: Sequence[str], output_dir: str, options):
     """
     Add metadata to a directory with audio files
 
     :param audiobook: Audiobook object. Stores metadata
-    :param filepaths: Iterable over filepaths of output files
+    :param filepaths: Filepaths of output files in the same order as `audiobook.files`
     :param output_dir: Directory where files are stored
     :param optiosn: Cli options
     """
     logging.book_update("Adding metadata")
-    for filepath in filepaths:
-        metadata.add_metadata(filepath, audiobook.metadata)
+    titles = [ file.title for file in audiobook.files ]
+    metadata.add_metadata_to_files(filepaths, audiobook.metadata, titles)
     if options.write_json_metadata:
         metadata_file_path = os.path.join(output_dir, "metadata.json")
-        with open(metadata_file_path, "w") as f:
-            f.write(audiobook.metadata.as_json())
+        with open(metadata_file_path, "wb") as f:
+            f.write(audiobook.metadata.snapshot().json)
     if audiobook.cover:
         logging.book_update("Adding cover")
         cover_path = os.path.join(output_dir, f"cover.{audiobook.cover.extension}")
@@ -158,8 +250,10 @@ def download_files_with_cli_output(audiobook: Audiobook, output_dir: str) -> Lis
         # Make sure progress bar is at 100%
         remaining_progress: float = progress.tasks[0].remaining or 0
         update_progress(remaining_progress)
-        # Return filenames of downloaded files
-        return filepaths
+    for host, (connections, requests_sent) in http.connection_stats(audiobook.session).items():
+        logging.debug(f"{host}: {requests_sent} requests over {connections} connections")
+    # Return filenames of downloaded files
+    return filepaths
 
 
 def create_filepath(audiobook: Audiobook, output_dir: str, index: int) -> Tuple[str, str]:
@@ -182,18 +276,34 @@ def create_filepath(audiobook: Audiobook, output_dir: str, index: int) -> Tuple[
     return path, path_tmp
 
 
+@profiling.traced()
 def download_file(args: Tuple[Audiobook, str, int, Any]) -> str:
     # Prepare download
     audiobook, output_dir, index, update_progress = args
     file = audiobook.files[index]
     filepath, filepath_tmp = create_filepath(audiobook, output_dir, index)
     logging.debug(f"Starting downloading file: {file.url}")
+    url: Optional[str] = file.url if file.url_is_resolved else None
     # Retry transient network failures (e.g. a dropped TLS connection) so one
     # flaky segment does not crash the whole batch via the thread pool.
     for attempt in range(DOWNLOAD_ATTEMPTS):
         advanced = 0.0
         try:
-            request = audiobook.session.get(file.url, headers=file.headers, stream=True)
+            if url is None:
+                url = file.url_resolver() if file.url_resolver else file.url
+            request = audiobook.session.get(url, headers=file.headers, stream=True)
+            if file.url_resolver and request.status_code in EXPIRED_URL_STATUS_CODES \
+                    and attempt + 1 < DOWNLOAD_ATTEMPTS:
+                logging.debug(
+                    f"Url for {file.url} was rejected with status code "
+                    f"{request.status_code}; requesting a new url"
+                )
+                metrics.increment("download_retries_total", reason="expired_url")
+                # The body is not read, so the connection is only returned
+                # to the pool when the response is closed
+                request.close()
+                url = None
+                continue
             content_type: Optional[str] = request.headers.get("Content-type", None)
 
             expected = file.expected_content_type
@@ -217,39 +327,73 @@ def download_file(args: Tuple[Audiobook, str, int, Any]) -> str:
                     expected_status_code=file.expected_status_code,
                     expected_content_type=file.expected_content_type,
                     body = safe_body,
-                    url = file.url
+                    url = url
                 )
 
             total_filesize = int(request.headers["Content-length"])
 
-            # Download file to tmp file
+            # Download file to tmp file. Encrypted files are decrypted while
+            # they are downloaded, so they are never stored encrypted
+            decryptor = None
+            if file.encryption_method:
+                decryptor = encryption.create_decryptor(file.encryption_method, filepath_tmp)
+            downloaded = 0
+            decrypt_time = 0.
+            start = time.perf_counter()
             with open(filepath_tmp, "wb") as f:
-                for chunk in request.iter_content(chunk_size=1024):
-                    f.write(chunk)
+                preallocate(f, total_filesize)
+                for chunk in request.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if decryptor:
+                        decrypt_start = time.perf_counter()
+                        f.write(decryptor.update(chunk))
+                        decrypt_time += time.perf_counter() - decrypt_start
+                    else:
+                        f.write(chunk)
+                    downloaded += len(chunk)
                     download_progress = len(chunk) / total_filesize
                     update_progress(download_progress)
                     advanced += download_progress
+                if decryptor:
+                    f.write(decryptor.finalize())
+                # Remove preallocated space that was not used
+                f.truncate()
+            host = urlsplit(url).hostname or ""
+            metrics.increment("download_bytes_total", downloaded, host=host)
+            metrics.increment("download_seconds_total", time.perf_counter() - start, host=host)
+            metrics.increment("downloaded_files_total", host=host)
+            if decryptor:
+                metrics.increment("phase_seconds_total", decrypt_time, phase="decrypt")
             break
         except requests.exceptions.RequestException as error:
             # Undo this attempt's progress before retrying so the bar stays accurate
             update_progress(-advanced)
             if attempt + 1 >= DOWNLOAD_ATTEMPTS:
                 raise
+            metrics.increment("download_retries_total", reason="network_error")
             delay = 2 ** attempt
             logging.debug(
                 f"Download attempt {attempt + 1}/{DOWNLOAD_ATTEMPTS} failed for "
                 f"{file.url} ({error}); retrying in {delay}s"
             )
             time.sleep(delay)
-    # Decrypt file if necessary
-    if file.encryption_method:
-        encryption.decrypt_file(filepath_tmp, file.encryption_method)
     # rename file after download is complete
     os.rename(filepath_tmp, filepath)
     # Return filepath
     return filepath
 
 
+def preallocate(f, size: int):
+    """
+    Reserve disk space for file, so large files are not fragmented.
+    Does nothing where preallocation is not supported.
+    """
+    if size > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except OSError:
+            pass
+
+
 def download_files(audiobook: Audiobook, output_dir: str, update_progress) -> List[str]:
     """Download files from audiobook and return paths of the downloaded files"""
     filepaths = []
@@ -257,7 +401,7 @@ def download_files(audiobook: Audiobook, output_dir: str, update_progress) -> Li
         arguments = []
         for index in range(len(audiobook.files)):
             arguments.append((audiobook, output_dir, index, update_progress))
-        for filepath in pool.imap(download_file, arguments):
+        for filepath in pool.imap(metrics.in_current_scope(download_file), arguments):
             filepaths.append(filepath)
     return filepaths
 
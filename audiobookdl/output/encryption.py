@@ -1,15 +1,78 @@
 from Crypto.Cipher import AES
+from audiobookdl.exceptions import DecryptionError
 from audiobookdl.utils.audiobook import AudiobookFileEncryption, AESEncryption
 
+import os
+
+# Bytes read at a time when decrypting a file on disk
+DECRYPT_CHUNK_SIZE = 1024 * 1024
+
+
+class AESDecryptor:
+    """
+    Decrypts an AES-CBC encrypted stream in chunks of any size.
+    The last block is held back until the stream ends, so padding can be
+    removed without reading the whole stream into memory.
+    """
+
+    def __init__(self, encryption_method: AESEncryption, path: str = ""):
+        self._cipher = AES.new(encryption_method.key, AES.MODE_CBC, encryption_method.iv)
+        self._padding = encryption_method.padding
+        self._buffer = bytearray()
+        self._size = 0
+        self._path = path
+
+    def update(self, data: bytes) -> bytes:
+        """Decrypt next part of stream. Returns all data that can be decrypted yet."""
+        self._size += len(data)
+        self._buffer += data
+        ready = len(self._buffer) - (len(self._buffer) % AES.block_size or AES.block_size)
+        if ready <= 0:
+            return b""
+        decrypted = self._cipher.decrypt(self._buffer[:ready])
+        del self._buffer[:ready]
+        return decrypted
+
+    def finalize(self) -> bytes:
+        """Decrypt end of stream"""
+        if len(self._buffer) % AES.block_size != 0:
+            raise DecryptionError(path = self._path, size = self._size)
+        decrypted = self._cipher.decrypt(self._buffer)
+        self._buffer.clear()
+        if self._padding and decrypted:
+            padding_length = decrypted[-1]
+            # Files without valid padding are kept as they are
+            if 0 < padding_length <= AES.block_size \
+                    and decrypted[-padding_length:] == bytes([padding_length]) * padding_length:
+                decrypted = decrypted[:-padding_length]
+        return decrypted
+
+
+def create_decryptor(encryption_method: AudiobookFileEncryption, path: str = "") -> AESDecryptor:
+    """
+    Create decryptor for stream encrypted with `encryption_method`
+
+    :param encryption_method: Encryption of stream
+    :param path: Path of file used in error messages
+    """
+    return AESDecryptor(encryption_method, path)
+
+
 def decrypt_file(path: str, encryption_method: AudiobookFileEncryption):
     """Decrypt encrypted file in place"""
     if isinstance(encryption_method, AESEncryption):
-        decrypt_file_aes(path, encryption_method.key, encryption_method.iv)
-
-def decrypt_file_aes(path: str, key: bytes, iv: bytes):
-    """Decrypt AES encrypted file in place"""
-    with open(path, "rb") as f:
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        decrypted = cipher.decrypt(f.read())
-    with open(path, "wb") as f:
-        f.write(decrypted)
+        decrypt_file_aes(path, encryption_method)
+
+def decrypt_file_aes(path: str, encryption_method: AESEncryption):
+    """Decrypt AES encrypted file in place without reading it all into memory"""
+    decryptor = AESDecryptor(encryption_method, path)
+    path_decrypted = f"{path}.decrypted"
+    try:
+        with open(path, "rb") as encrypted, open(path_decrypted, "wb") as decrypted:
+            while chunk := encrypted.read(DECRYPT_CHUNK_SIZE):
+                decrypted.write(decryptor.update(chunk))
+            decrypted.write(decryptor.finalize())
+    except DecryptionError:
+        os.remove(path_decrypted)
+        raise
+    os.replace(path_decrypted, path)
@@ -1,9 +1,61 @@
 from . import id3, mp4, ffmpeg
-from audiobookdl import logging, Chapter, AudiobookMetadata, Cover
+from audiobookdl import logging, metrics, profiling, Chapter, AudiobookMetadata, Cover
 from audiobookdl.utils import program_in_path
 
 import os
-from typing import Sequence
+from attrs import evolve
+from multiprocessing.pool import ThreadPool
+from typing import Optional, Sequence, Tuple
+
+# Max number of files tagged at the same time
+TAGGING_THREADS = 8
+
+@profiling.traced()
+def write_metadata(
+        filepath: str,
+        metadata: AudiobookMetadata,
+        chapters: Optional[Sequence[Chapter]],
+        cover: Optional[Cover]
+    ):
+    """
+    Adds metadata, chapters, and cover to the given audio file.
+    ID3 files are only written once.
+    """
+    if id3.is_id3_file(filepath):
+        id3.write_id3(filepath, metadata, chapters, cover)
+        return
+    add_metadata(filepath, metadata)
+    if chapters:
+        add_chapters(filepath, chapters)
+    if cover:
+        embed_cover(filepath, cover)
+
+
+def add_metadata_to_files(
+        filepaths: Sequence[str],
+        metadata: AudiobookMetadata,
+        titles: Sequence[Optional[str]]
+    ):
+    """
+    Adds metadata to multiple audio files in parallel. ID3 tags shared by all
+    files are only created once.
+
+    :param filepaths: Audio files
+    :param metadata: Metadata of the whole book
+    :param titles: Title of each file. Files without a title get the title of the book
+    """
+    id3_tags = None
+    if any(id3.is_id3_file(filepath) for filepath in filepaths):
+        id3_tags = id3.create_id3_tags(metadata)
+    def add_to_file(args: Tuple[str, Optional[str]]):
+        filepath, title = args
+        if id3_tags is not None and id3.is_id3_file(filepath):
+            id3.add_id3_tags(filepath, id3_tags, title)
+        else:
+            add_metadata(filepath, evolve(metadata, title=title) if title else metadata)
+    with ThreadPool(max(1, min(len(filepaths), TAGGING_THREADS))) as pool:
+        pool.map(metrics.in_current_scope(add_to_file), zip(filepaths, titles))
+
 
 def add_metadata(filepath: str, metadata: AudiobookMetadata):
     """Adds metadata to the given audio file"""
@@ -1,11 +1,13 @@
-from audiobookdl import Chapter, utils, logging
+from audiobookdl import Chapter, utils, logging, metrics
 from mutagen import File as MutagenFile
-import subprocess
 import os
-from typing import Sequence
+import shutil
+import tempfile
+from typing import Sequence, TextIO
 
-TMP_CHAPTER_FILE = "chapters.tmp.txt"
-TMP_MEDIA_FILE = "audiobook.tmp.mp4"
+# Suffixes of temporary files created next to the tagged file
+TMP_CHAPTER_SUFFIX = ".chapters.txt"
+TMP_MEDIA_SUFFIX = ".mp4"
 
 def create_chapter_text(title: str, start: int, end: int) -> str:
     chapter_template = utils.read_asset_file("assets/ffmpeg_chapter_template.txt")
@@ -16,63 +18,77 @@ def create_chapter_text(title: str, start: int, end: int) -> str:
     )
 
 
-def create_tmp_chapter_file(filepath: str, chapters: Sequence[Chapter]) -> str:
-    result = ";FFMETADATA1\n"
-    for i in range(len(chapters)-1):
-        chapter = chapters[i]
-        result += create_chapter_text(chapter.title, chapter.start, chapters[i+1].start)
+def write_tmp_chapter_file(f: TextIO, filepath: str, chapters: Sequence[Chapter]) -> None:
+    """
+    Write chapters as an ffmpeg metadata file
+
+    :param f: File to write to
+    :param filepath: Audio file the chapters belong to
+    :param chapters: Chapters of audio file
+    """
+    f.write(";FFMETADATA1\n")
+    for chapter, next_chapter in zip(chapters, chapters[1:]):
+        f.write(create_chapter_text(chapter.title, chapter.start, next_chapter.start))
     length = MutagenFile(filepath).info.length*1000
     last_chapter = chapters[-1]
-    result += create_chapter_text(
+    f.write(create_chapter_text(
         title = last_chapter.title,
         start = last_chapter.start,
         end = int(length)
-    )
-    return result
+    ))
+
+def create_tmp_file(filepath: str, suffix: str) -> str:
+    """
+    Create empty temporary file next to `filepath`. Every call gets its own
+    file, so books can be tagged at the same time.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix=".audiobook-dl-", dir=os.path.dirname(filepath) or ".")
+    os.close(fd)
+    return path
+
 
 def add_chapters_ffmpeg(filepath: str, chapters: Sequence[Chapter]):
+    chapter_file = create_tmp_file(filepath, TMP_CHAPTER_SUFFIX)
+    media_file = create_tmp_file(filepath, TMP_MEDIA_SUFFIX)
     try:
-        with open(TMP_CHAPTER_FILE, "w") as f:
-            f.write(create_tmp_chapter_file(filepath, chapters))
-        result = subprocess.run(
+        with open(chapter_file, "w") as f:
+            write_tmp_chapter_file(f, filepath, chapters)
+        result = metrics.run_program(
             ["ffmpeg", "-y",
              "-i", filepath,
-             "-i", TMP_CHAPTER_FILE,
+             "-i", chapter_file,
              "-map_chapters", "1",
              "-c", "copy",
              "-map", "0",
              "-metadata:s:a:0", "title=",
-             TMP_MEDIA_FILE],
+             media_file],
             capture_output = not logging.ffmpeg_output
         )
         produced_output = (
-            os.path.exists(TMP_MEDIA_FILE) and os.path.getsize(TMP_MEDIA_FILE) > 0
+            os.path.exists(media_file) and os.path.getsize(media_file) > 0
         )
         if result.returncode != 0 or not produced_output:
             logging.debug("add_chapters_ffmpeg copy mode failed, retrying with re-encode")
-            if os.path.exists(TMP_MEDIA_FILE):
-                os.remove(TMP_MEDIA_FILE)
-            subprocess.run(
+            metrics.run_program(
                 ["ffmpeg", "-y",
                  "-i", filepath,
-                 "-i", TMP_CHAPTER_FILE,
+                 "-i", chapter_file,
                  "-map_chapters", "1",
                  "-c:a", "aac",
                  "-b:a", "128k",
                  "-map", "0",
                  "-metadata:s:a:0", "title=",
-                 TMP_MEDIA_FILE],
+                 media_file],
                 capture_output = not logging.ffmpeg_output
             )
         # ffmpeg produced no output: keep the chapterless original instead of crashing the run
-        if not (os.path.exists(TMP_MEDIA_FILE) and os.path.getsize(TMP_MEDIA_FILE) > 0):
+        if not (os.path.exists(media_file) and os.path.getsize(media_file) > 0):
             logging.log("Could not embed chapters; leaving file as-is")
             return
-        os.remove(filepath)
-        os.rename(TMP_MEDIA_FILE, filepath)
+        # Temporary files are only readable by the user
+        shutil.copymode(filepath, media_file)
+        os.replace(media_file, filepath)
     finally:
-        if os.path.exists(TMP_CHAPTER_FILE):
-            os.remove(TMP_CHAPTER_FILE)
-        if os.path.exists(TMP_MEDIA_FILE):
-            os.remove(TMP_MEDIA_FILE)
-        
+        for path in (chapter_file, media_file):
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,15 +1,15 @@
 import re
 import os
 from datetime import date
-from audiobookdl import logging, Chapter, AudiobookMetadata, Cover
+from audiobookdl import logging, profiling, Chapter, AudiobookMetadata, Cover
 
-from mutagen import File as MutagenFile
+from mutagen import PaddingInfo
 from mutagen.easyid3 import EasyID3, EasyID3KeyError
 from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC, CHAP, TIT2, CTOC, CTOCFlags, WCOM, ID3NoHeaderError
+from mutagen.id3 import ID3, APIC, CHAP, TIT2, CTOC, CTOCFlags, WCOM
 from requests import utils
 
-from typing import Sequence
+from typing import Optional, Sequence
 
 EasyID3.RegisterTextKey("comment", "COMM")
 EasyID3.RegisterTextKey("year", "TYER")
@@ -47,6 +47,9 @@ ID3_CONVERT = {
     "scrape_url": "commercialurl", # WCOM
 }
 
+# Bytes of padding reserved after ID3 tags when the file has to be rewritten
+ID3_PADDING = 16 * 1024
+
 # List of file formats that use ID3 metadata
 ID3_FORMATS = ["mp3"]
 
@@ -62,36 +65,37 @@ def is_id3_file(filepath: str) -> bool:
     return ext is not None and ext.group(0) in ID3_FORMATS
 
 
-def add_id3_metadata(filepath: str, metadata: AudiobookMetadata):
-    """Add ID3 metadata tags to the given audio file"""
-    audio = MP3(filepath, ID3=EasyID3)
-    # Adding tags
-    for key, value in metadata.all_properties(allow_duplicate_keys=None):
+def set_easy_id3_tag(id3: ID3, key: str, value):
+    """Set tag in `id3` by its EasyID3 name"""
+    if isinstance(value, str):
+        value = [value]
+    EasyID3.Set[key](id3, key, value)
+
+
+def set_id3_metadata(id3: ID3, metadata: AudiobookMetadata):
+    """Set ID3 metadata tags in `id3`"""
+    for key, value in metadata.snapshot().tags:
         if key == "release_date":
-            audio["originaldate"] = value.strftime("%Y-%m-%d")
-            audio["year"] = audio["originaldate"]
+            release_date = value.strftime("%Y-%m-%d")
+            set_easy_id3_tag(id3, "originaldate", release_date)
+            set_easy_id3_tag(id3, "year", release_date)
         elif key == "language":
-            audio["language"] = value.alpha_3
+            set_easy_id3_tag(id3, "language", value.alpha_3)
         elif key == "narrators":
-            audio["composer"] = value
-            audio["performer"] = value
+            set_easy_id3_tag(id3, "composer", value)
+            set_easy_id3_tag(id3, "performer", value)
         elif key == "series_order":
-            audio["tracknumber"] = str(value)
+            set_easy_id3_tag(id3, "tracknumber", str(value))
         elif key in ID3_CONVERT:
-            audio[ID3_CONVERT[key]] = value
+            set_easy_id3_tag(id3, ID3_CONVERT[key], value)
         elif key in EasyID3.valid_keys.keys():
-            audio[key] = value
-    audio.save(v2_version=4)
+            set_easy_id3_tag(id3, key, value)
 
 
-def embed_id3_cover(filepath: str, cover: Cover):
+def set_id3_cover(id3: ID3, cover: Cover):
+    """Set cover image in `id3`"""
     mimetype = EXTENSION_TO_MIMETYPE[cover.extension]
-    try:
-        audio = ID3(filepath)
-    except ID3NoHeaderError:
-        return
-    audio.add(APIC(type=0, data=cover.image, mime=mimetype))
-    audio.save()
+    id3.add(APIC(type=0, data=cover.image, mime=mimetype))
 
 
 def add_id3_chapter(audio: ID3, start: int, end: int, title: str, index: int):
@@ -104,17 +108,106 @@ def add_id3_chapter(audio: ID3, start: int, end: int, title: str, index: int):
     ))
 
 
+def set_id3_chapters(id3: ID3, chapters: Sequence[Chapter], length: float):
+    """
+    Set chapters and a table of contents listing them in `id3`
+
+    :param id3: Tags to add chapters to
+    :param chapters: Chapters of audio file
+    :param length: Length of audio file in milliseconds
+    """
+    id3.delall("CHAP")
+    id3.delall("CTOC")
+    ends = [ chapter.start for chapter in chapters[1:] ] + [ int(length) ]
+    for index, (chapter, end) in enumerate(zip(chapters, ends), 1):
+        add_id3_chapter(id3, chapter.start, end, chapter.title, index)
+    id3.add(CTOC(
+        element_id=u"toc",
+        flags=CTOCFlags.TOP_LEVEL | CTOCFlags.ORDERED,
+        child_element_ids=[ u"chp"+str(i) for i in range(1, len(chapters)+1) ],
+        sub_frames=[TIT2(text=[u"Table of Contents"])]
+    ))
+
+
+def id3_padding(info: PaddingInfo) -> int:
+    """
+    Keep existing padding if the tags still fit. Otherwise reserve
+    `ID3_PADDING` bytes, so later edits don't move the audio data again.
+    """
+    if info.padding >= 0:
+        return info.padding
+    return ID3_PADDING
+
+
+def save_id3(audio: MP3):
+    audio.save(v2_version=4, padding=id3_padding)
+
+
+@profiling.traced()
+def write_id3(
+        filepath: str,
+        metadata: Optional[AudiobookMetadata] = None,
+        chapters: Optional[Sequence[Chapter]] = None,
+        cover: Optional[Cover] = None,
+    ):
+    """
+    Add metadata, chapters, and cover to the given audio file.
+    All tags are built in memory and the file is only written once.
+    """
+    audio = MP3(filepath)
+    if audio.tags is None:
+        audio.add_tags()
+    id3: ID3 = audio.tags # type: ignore
+    if metadata is not None:
+        set_id3_metadata(id3, metadata)
+    if chapters:
+        # Stream info is always read when an mp3 file is opened
+        assert audio.info is not None
+        set_id3_chapters(id3, chapters, audio.info.length*1000)
+    if cover is not None:
+        set_id3_cover(id3, cover)
+    save_id3(audio)
+
+
+def create_id3_tags(metadata: AudiobookMetadata) -> ID3:
+    """
+    Create ID3 tags from metadata without a file, so they can be added to
+    many files with `add_id3_tags`
+    """
+    tags = ID3()
+    set_id3_metadata(tags, metadata)
+    return tags
+
+
+@profiling.traced()
+def add_id3_tags(filepath: str, tags: ID3, title: Optional[str] = None):
+    """
+    Add tags created with `create_id3_tags` to the given audio file.
+    `tags` is not modified, so it can be shared between threads.
+
+    :param filepath: Audio file
+    :param tags: Tags to add
+    :param title: Title of file. Replaces title in `tags`
+    """
+    audio = MP3(filepath)
+    if audio.tags is None:
+        audio.add_tags()
+    for frame in tags.values():
+        audio.tags.add(frame) # type: ignore
+    if title:
+        audio.tags.setall("TIT2", [TIT2(encoding=3, text=[title])]) # type: ignore
+    save_id3(audio)
+
+
+def add_id3_metadata(filepath: str, metadata: AudiobookMetadata):
+    """Add ID3 metadata tags to the given audio file"""
+    write_id3(filepath, metadata=metadata)
+
+
+def embed_id3_cover(filepath: str, cover: Cover):
+    write_id3(filepath, cover=cover)
+
+
 def add_id3_chapters(filepath: str, chapters: Sequence[Chapter]):
     """Adds chapters to the given audio file"""
-    audio = ID3(filepath)
-    for i in range(len(chapters)-1):
-        add_id3_chapter(
-            audio,
-            start = chapters[i].start,
-            end = chapters[i+1].start,
-            title = chapters[i].title,
-            index = i+1
-        )
-    length = MutagenFile(filepath).info.length*1000
-    add_id3_chapter(audio, chapters[-1].start, length, chapters[-1].title, len(chapters))
-    audio.save()
+    write_id3(filepath, chapters=chapters)
@@ -1,7 +1,7 @@
 import re
 from datetime import date
 
-from audiobookdl import logging, AudiobookMetadata, Cover
+from audiobookdl import logging, profiling, AudiobookMetadata, Cover
 from mutagen.easymp4 import EasyMP4, EasyMP4Tags
 from mutagen.mp4 import MP4, MP4Cover, Chapter as MP4Chapter, MP4Chapters
 
@@ -34,10 +34,11 @@ def is_mp4_file(filepath: str) -> bool:
     return ext is not None and ext.group(0) in MP4_EXTENSIONS
 
 
+@profiling.traced()
 def add_mp4_metadata(filepath: str, metadata: AudiobookMetadata):
     """Add mp4 metadata tags to the given audio file"""
     audio = EasyMP4(filepath)
-    for key, value in metadata.all_properties(allow_duplicate_keys=None):
+    for key, value in metadata.snapshot().tags:
         # System defined metadata tags
         if key == "release_date":
             release_date: date = value
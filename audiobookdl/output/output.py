@@ -1,10 +1,9 @@
-from audiobookdl import logging, AudiobookMetadata
+from audiobookdl import logging, metrics, profiling, AudiobookMetadata
 from audiobookdl.exceptions import FailedCombining
 
 import os
 import shutil
 import platform
-import subprocess
 from multiprocessing.pool import ThreadPool
 from typing import Sequence, Mapping
 
@@ -28,7 +27,7 @@ def gen_output_filename(booktitle: str, file: Mapping[str, str], template: str)
 
 def _ffmpeg_audio_codec(path: str) -> str:
     """Returns the codec name of the first audio stream in `path` (empty on failure)"""
-    result = subprocess.run(
+    result = metrics.run_program(
         [
             "ffprobe", "-v", "error",
             "-select_streams", "a:0",
@@ -43,7 +42,7 @@ def _ffmpeg_audio_codec(path: str) -> str:
 
 def _ffprobe_duration(path: str) -> float:
     """Returns the duration of `path` in seconds (0.0 on failure)"""
-    result = subprocess.run(
+    result = metrics.run_program(
         ["ffprobe", "-v", "error", "-show_entries", "format=duration",
          "-of", "default=noprint_wrappers=1:nokey=1", path],
         capture_output=True, text=True,
@@ -65,7 +64,7 @@ def _remux_to_mpegts(source: str, ts_path: str) -> bool:
 
     :returns: `True` if a non-empty file was produced
     """
-    result = subprocess.run(
+    result = metrics.run_program(
         ["ffmpeg", "-y", "-i", source, "-c", "copy", "-f", "mpegts", ts_path],
         capture_output=not logging.ffmpeg_output,
     )
@@ -76,6 +75,7 @@ def _remux_to_mpegts(source: str, ts_path: str) -> bool:
     return False
 
 
+@profiling.traced()
 def combine_audiofiles(filepaths: Sequence[str], tmp_dir: str, output_path: str):
     """
     Combines the given audiofiles in `path` into a new file
@@ -94,7 +94,7 @@ def combine_audiofiles(filepaths: Sequence[str], tmp_dir: str, output_path: str)
         ts_path = os.path.join(ts_dir, f"{str(index).zfill(padding)}.ts")
         return ts_path, _remux_to_mpegts(source, ts_path)
     with ThreadPool(processes=COMBINE_REMUX_THREADS) as pool:
-        remuxed = pool.map(remux, list(enumerate(filepaths)))
+        remuxed = pool.map(metrics.in_current_scope(remux), list(enumerate(filepaths)))
     ts_paths = []
     for ts_path, ok in remuxed:
         if not ok:
@@ -115,7 +115,7 @@ def combine_audiofiles(filepaths: Sequence[str], tmp_dir: str, output_path: str)
     if output_extension in MP4_CONTAINERS and _ffmpeg_audio_codec(ts_paths[0]) == "aac":
         command += ["-bsf:a", "aac_adtstoasc"]
     command.append(output_path)
-    result = subprocess.run(command, capture_output=not logging.ffmpeg_output)
+    result = metrics.run_program(command, capture_output=not logging.ffmpeg_output)
     if not (os.path.exists(output_path) and os.path.getsize(output_path) > 0):
         if result.stderr:
             logging.debug(result.stderr.decode("utf8", "replace"))
@@ -157,6 +157,7 @@ def can_copy_codec(input_format: str, output_format: str) -> bool:
         or (input_format == "ts" and output_format == "mp3")
 
 
+@profiling.traced()
 def convert_output(filenames: Sequence[str], output_format: str):
     """Converts a list of audio files into another format and return new
     files"""
@@ -166,12 +167,12 @@ def convert_output(filenames: Sequence[str], output_format: str):
         new_path = f"{path_without_ext}.{output_format}"
         if not output_format == old_ext:
             if can_copy_codec(old_ext, output_format):
-                subprocess.run(
+                metrics.run_program(
                     ["ffmpeg", "-i", old_path, "-codec", "copy", new_path],
                     capture_output=not logging.ffmpeg_output
                 )
             else:
-                subprocess.run(
+                metrics.run_program(
                     ["ffmpeg", "-i", old_path, new_path],
                     capture_output=not logging.ffmpeg_output
                 )
@@ -217,7 +218,7 @@ def gen_output_location(template: str, metadata: AudiobookMetadata, remove_chars
     if title_len > max_name_length - ext_len:
         title = title_bytes[0:max_name_length-ext_len].decode('utf-8', errors='ignore')
         logging.log(f"title to long, using [blue]{title}[/blue] as filename base")
-    metadata_dict = {**LOCATION_DEFAULTS, **metadata.all_properties_dict()}
+    metadata_dict = {**LOCATION_DEFAULTS, **metadata.snapshot().template}
     metadata_dict['title'] = title
     formatted = template.format(**metadata_dict)
     formatted = _remove_chars(formatted, remove_chars)
@@ -0,0 +1,179 @@
+"""
+Tracing of where time is spent while processing books.
+
+Spans are only recorded when `enabled` is set, so they cost almost nothing
+in normal runs. Recorded spans can be written as Chrome trace events, which
+can be opened in chrome://tracing or https://ui.perfetto.dev, or as
+collapsed stacks for flame graph tools like flamegraph.pl and speedscope.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Output formats of `write`
+TRACE_FORMAT = "trace"
+COLLAPSED_FORMAT = "collapsed"
+FORMATS = [ TRACE_FORMAT, COLLAPSED_FORMAT ]
+
+# Spans are only recorded when enabled
+enabled = False
+
+_lock = threading.Lock()
+# Chrome trace events of finished spans
+_events: List[Dict[str, Any]] = []
+# Time in microseconds spent in each stack of spans, excluding time spent in
+# spans started inside them
+_stacks: Dict[Tuple[str, ...], float] = {}
+# Names of threads that recorded spans
+_thread_names: Dict[int, str] = {}
+_local = threading.local()
+
+
+class _Frame:
+    """Span in progress"""
+
+    def __init__(self, name: str, start: float):
+        self.name = name
+        self.start = start
+        # Seconds spent in spans started inside this span
+        self.children = 0.
+
+
+def _frames() -> List[_Frame]:
+    if not hasattr(_local, "frames"):
+        _local.frames = []
+    return _local.frames
+
+
+def current_stack() -> Tuple[str, ...]:
+    """Names of spans in progress on current thread, including spans inherited with `in_current_stack`"""
+    return getattr(_local, "parent", ()) + tuple(frame.name for frame in _frames())
+
+
+def _record(name: str, start: float, duration: float, self_time: float, args: Dict[str, Any]) -> None:
+    stack = current_stack() + (name,)
+    thread = threading.current_thread()
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": start * 1e6,
+        "dur": duration * 1e6,
+        "pid": os.getpid(),
+        "tid": thread.ident,
+        "args": args,
+    }
+    with _lock:
+        _events.append(event)
+        _stacks[stack] = _stacks.get(stack, 0) + self_time * 1e6
+        _thread_names[thread.ident or 0] = thread.name
+    frames = _frames()
+    if frames:
+        frames[-1].children += duration
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Record time spent in block
+
+    :param name: Name of span
+    :param args: Extra information shown with the span in trace viewers
+    :returns: Dictionary of extra information that can be updated in the block
+    """
+    if not enabled:
+        yield args
+        return
+    frame = _Frame(name, time.perf_counter())
+    frames = _frames()
+    frames.append(frame)
+    try:
+        yield args
+    finally:
+        frames.pop()
+        duration = time.perf_counter() - frame.start
+        _record(name, frame.start, duration, duration - frame.children, args)
+
+
+def add_span(name: str, start: float, duration: float, **args: Any) -> None:
+    """
+    Record span that has already finished, like a http request measured by `requests`
+
+    :param start: Start of span as returned by `time.perf_counter`
+    :param duration: Seconds spent in span
+    """
+    if enabled:
+        _record(name, start, duration, duration, args)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator recording a span every time the function is called"""
+    def decorator(function: Callable[..., T]) -> Callable[..., T]:
+        span_name = name or function.__qualname__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs) -> T:
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_current_stack(function: Callable[..., T]) -> Callable[..., T]:
+    """Make spans of `function` nested in the spans of the current thread when it runs in another thread"""
+    parent = current_stack()
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs) -> T:
+        previous = getattr(_local, "parent", ())
+        _local.parent = parent
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.parent = previous
+    return wrapper
+
+
+def clear() -> None:
+    """Remove recorded spans"""
+    with _lock:
+        _events.clear()
+        _stacks.clear()
+        _thread_names.clear()
+
+
+def trace_events() -> Dict[str, Any]:
+    """Recorded spans in the Chrome trace event format"""
+    with _lock:
+        metadata = [
+            { "name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": { "name": name } }
+            for tid, name in _thread_names.items()
+        ]
+        return { "traceEvents": metadata + list(_events), "displayTimeUnit": "ms" }
+
+
+def collapsed_stacks() -> str:
+    """Recorded spans as collapsed stacks with time in microseconds"""
+    with _lock:
+        lines = [
+            f"{';'.join(stack)} {round(microseconds)}"
+            for stack, microseconds in sorted(_stacks.items())
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def write(path: str, format: str = TRACE_FORMAT) -> None:
+    """
+    Write recorded spans to file
+
+    :param path: Output path
+    :param format: `TRACE_FORMAT` or `COLLAPSED_FORMAT`
+    """
+    with open(path, "w") as f:
+        if format == COLLAPSED_FORMAT:
+            f.write(collapsed_stacks())
+        else:
+            json.dump(trace_events(), f)
@@ -1,59 +1,186 @@
 from .source import Source
 
-from .audiobooksdotcom import AudiobooksdotcomSource
-from .blinkist import BlinkistSource
-from .bookbeat import BookBeatSource
-from .chirp import ChirpSource
-from .ereolen import EreolenSource
-from .librivox import LibrivoxSource
-from .nextory import NextorySource
-from .overdrive import OverdriveSource
-from .podimo import PodimoSource
-from .saxo import SaxoSource
-from .everand import EverandSource
-from .storytel import StorytelSource
-from .yourcloudlibrary import YourCloudLibrarySource
-
 from ..exceptions import NoSourceFound
+from ..utils import read_asset_file
+from attrs import define
+import functools
+import importlib
 import re
-from typing import Iterable, List, Type
+from typing import Callable, FrozenSet, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+
+@define
+class SourceEntry:
+    """
+    Information about a source that is available without importing it.
+    Source modules are only imported when a url needs them.
+    """
+    # Name of module in `audiobookdl.sources`
+    module: str
+    # Name of source class in module
+    class_name: str
+    # Same as `Source.names`
+    names: List[str]
+    # Same as `Source.match`
+    match: List[str]
+    # Returns the hostnames `match` is limited to. Only called when a url is
+    # matched, so large lists of hosts are not loaded at import.
+    hosts: Optional[Callable[[], FrozenSet[str]]] = None
+
+    def load(self) -> Type[Source]:
+        """Import source module and return source class"""
+        module = importlib.import_module(f"{__name__}.{self.module}")
+        return getattr(module, self.class_name)
+
+
+@functools.lru_cache(maxsize=None)
+def ereolen_library_domains() -> FrozenSet[str]:
+    """Domains of every library supported by eReolen"""
+    return frozenset(read_asset_file("assets/sources/ereolen/libraries.txt").split())
+
+
+SOURCES: List[SourceEntry] = [
+    SourceEntry(
+        "audiobooksdotcom", "AudiobooksdotcomSource", [ "audiobooks.com" ],
+        [
+            r"https://www.audiobooks.com/book/stream/\d+(/\d)?",
+            r"https?://(www\.)?audiobooks\.com/audiobook/.+",
+            r"https?://(www\.)?audiobooks\.com/browse/library.*",
+        ]
+    ),
+    SourceEntry(
+        "blinkist", "BlinkistSource", [ "Blinkist" ],
+        [ r"https://www.blinkist.com/en/nc/reader/.+" ]
+    ),
+    SourceEntry(
+        "bookbeat", "BookBeatSource", [ "BookBeat" ],
+        [ r"https?://(www.)?bookbeat.+" ]
+    ),
+    SourceEntry(
+        "chirp", "ChirpSource", [ "Chirp" ],
+        [ r"https://www.chirpbooks.com/player/\d+" ]
+    ),
+    SourceEntry(
+        "ereolen", "EreolenSource", [ "eReolen" ],
+        [ r"https://[^/]+/work/work-of:.+" ],
+        hosts = ereolen_library_domains
+    ),
+    SourceEntry(
+        "librivox", "LibrivoxSource", [ "Librivox" ],
+        [ r"https?://librivox.org/.+" ]
+    ),
+    SourceEntry(
+        "nextory", "NextorySource", [ "Nextory" ],
+        [ r"https?://((www|catalog-\w\w).)?nextory.+" ]
+    ),
+    SourceEntry(
+        "overdrive", "OverdriveSource", [ "Overdrive", "Libby" ],
+        [ r"https://.+\.listen\.overdrive\.com" ]
+    ),
+    SourceEntry(
+        "podimo", "PodimoSource", [ "Podimo" ],
+        [
+            "https://open.podimo.com/audiobook/[^/]+",
+            "https://open.podimo.com/podcast/[^/]+",
+            "https://share.podimo.com/s/[^/]+",
+        ]
+    ),
+    SourceEntry(
+        "saxo", "SaxoSource", [ "Saxo" ],
+        [ r"https?://(www.)?saxo.(com|dk)/[^/]+/.+" ]
+    ),
+    SourceEntry(
+        "everand", "EverandSource", [ "Everand", "Scribd" ],
+        [
+            r"https?://(www.)?(scribd|everand).com/listen/\d+",
+            r"https?://(www.)?(scribd|everand).com/audiobook/\d+/",
+            r"https?://(www.)?(scribd|everand).com/series/\d+"
+        ]
+    ),
+    SourceEntry(
+        "storytel", "StorytelSource", [ "Storytel", "Mofibo" ],
+        [
+            r"https?://(?:www.)?(?:storytel|mofibo).com/(?P<language>\w+)(?:/(?P<language2>\w+))?/(?P<list_type>(?:books|series|authors|narrators|publishers|categories))/.+",
+            r"https?://(?:www\.)?(?:storytel|mofibo)\.com/\w+(?:/\w+)?/(?:want-to-read|bookshelf)/?$",
+        ]
+    ),
+    SourceEntry(
+        "yourcloudlibrary", "YourCloudLibrarySource", [ "YourCloudLibrary" ],
+        [
+            r"https?://audio.yourcloudlibrary.com/listen/.+",
+            r"https://ebook.yourcloudlibrary.com/library/[^/]+/detail/.+",
+        ]
+    ),
+]
+
 
 def find_compatible_source(url: str) -> Type[Source]:
     """Finds the first source that supports the given url"""
-    sources = get_source_classes()
-    for source in sources:
-        for n, m in enumerate(source.match):
-            if not re.match(m, url) is None:
-                return source
-    raise NoSourceFound
+    host_matchers = get_host_matchers()
+    if host_matchers:
+        host = urlsplit(url).hostname or ""
+        host = host[len("www."):] if host.startswith("www.") else host
+        for entry, matcher in host_matchers:
+            if host in entry.hosts() and matcher.match(url): # type: ignore[misc]
+                return entry.load()
+    m = get_url_matcher().match(url)
+    if m is None or m.lastgroup is None:
+        raise NoSourceFound
+    return SOURCES[int(m.lastgroup[len("source"):])].load()
 
 
-def get_source_classes() -> List[Type[Source]]:
-    """Returns a list of all available sources"""
+@functools.lru_cache(maxsize=None)
+def get_url_matcher() -> re.Pattern:
+    """
+    Compile the url patterns of all sources into a single regex.
+    The patterns of source number `n` in `SOURCES` are placed in the group
+    `source{n}`. Alternatives are tried in order, so the first matching
+    source wins just like when the patterns are tried one by one.
+    Sources limited to a set of hosts are matched by `get_host_matchers`.
+    """
+    groups = []
+    for index, entry in enumerate(SOURCES):
+        if entry.hosts is not None:
+            continue
+        # Names of groups have to be unique in the combined pattern
+        patterns = [ re.sub(r"\(\?P<\w+>", "(?:", m) for m in entry.match ]
+        if patterns:
+            alternatives = "|".join(f"(?:{p})" for p in patterns)
+            groups.append(f"(?P<source{index}>{alternatives})")
+    return re.compile("|".join(groups))
+
+
+@functools.lru_cache(maxsize=None)
+def get_host_matchers() -> List[Tuple[SourceEntry, re.Pattern]]:
+    """
+    Compile the url patterns of sources limited to a set of hosts.
+    The hostname of a url is looked up in the set before the pattern is
+    tried, so the time to match does not grow with the number of hosts.
+    """
     return [
-        AudiobooksdotcomSource,
-        BlinkistSource,
-        BookBeatSource,
-        ChirpSource,
-        EreolenSource,
-        LibrivoxSource,
-        NextorySource,
-        OverdriveSource,
-        PodimoSource,
-        SaxoSource,
-        EverandSource,
-        StorytelSource,
-        YourCloudLibrarySource,
+        (entry, re.compile("|".join(f"(?:{m})" for m in entry.match)))
+        for entry in SOURCES
+        if entry.hosts is not None
     ]
 
 
-def get_source_names() -> Iterable[str]:
+def get_source_classes() -> List[Type[Source]]:
+    """
+    Returns a list of all available sources
+    Imports every source module
+    """
+    return [ entry.load() for entry in SOURCES ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_source_names() -> Tuple[str, ...]:
     """
     Returns the names of all sources available
     There are sometimes multiple names for the same source
     """
     results: List[str] = []
-    for source in get_source_classes():
-        for source_name in source.names:
+    for entry in SOURCES:
+        for source_name in entry.names:
             results.append(source_name)
-    return sorted(results, key=lambda x: x.lower())
+    return tuple(sorted(results, key=lambda x: x.lower()))
@@ -1,6 +1,7 @@
 from .source import Source
 from audiobookdl import Audiobook, AudiobookFile, AudiobookMetadata, Cover
 from typing import List
+from functools import partial
 
 class BlinkistSource(Source):
     names = [ "Blinkist" ]
@@ -43,16 +44,21 @@ class BlinkistSource(Source):
         book_id = book_info["book"]["id"]
         for chapter in book_info["chapters"]:
             chapter_id = chapter["id"]
-            audio_url = self._session.get(
-                f"https://www.blinkist.com/api/books/{book_id}/chapters/{chapter_id}"
-            ).json()["signed_audio_url"]
+            chapter_url = f"https://www.blinkist.com/api/books/{book_id}/chapters/{chapter_id}"
+            # Signed urls can expire, so they are requested right before download
             files.append(AudiobookFile(
-                url = audio_url,
+                url = chapter_url,
                 ext = "m4a",
+                url_resolver = partial(self.download_signed_audio_url, chapter_url),
             ))
         return files
 
 
+    def download_signed_audio_url(self, chapter_url: str) -> str:
+        """Request a new signed url for the audio of a chapter"""
+        return self._session.get(chapter_url).json()["signed_audio_url"]
+
+
     def download_book_info(self, book_id: str) -> dict:
         return self._session.get(
             f"https://www.blinkist.com/api/books/{book_id}/chapters",
@@ -4,9 +4,13 @@ from typing import Any, List, Optional, Dict, MutableMapping, Union
 import uuid
 from audiobookdl.exceptions import UserNotAuthorized, MissingBookAccess
 import base64
+import hashlib
 import re
 
-
+# Number of saved books requested at a time
+SAVED_BOOKS_PAGE_SIZE = 100
+# Seconds a stored copy of the saved books is used before it is downloaded again
+SAVED_BOOKS_MAX_AGE = 60 * 60
 
 
 class BookBeatSource(Source):
@@ -17,8 +21,11 @@ class BookBeatSource(Source):
     _authentication_methods = [
         "login",
     ]
-    saved_books: dict
+    _login_attributes = [ "_saved_books_snapshot" ]
     book_info: dict
+    # Saved books by book id
+    _saved_books: Optional[Dict[str, dict]] = None
+    _saved_books_from_snapshot = False
 
     @staticmethod
     def create_device_id() -> str:
@@ -43,9 +50,7 @@ class BookBeatSource(Source):
         )
         token = tokens["token"]
         self._session.headers.update({"authorization": f"Bearer {token}"})
-        self.saved_books = self.get_json(
-            "https://api.bookbeat.com/api/my/books/saved?offset=0&limit=100"
-        )
+        self._saved_books_snapshot = f"saved_books_{hashlib.sha256(username.encode()).hexdigest()[:16]}"
 
 
     def download(self, url: str) -> Audiobook:
@@ -125,12 +130,52 @@ class BookBeatSource(Source):
         return Cover(cover_data, "jpg")
 
 
+    def download_saved_books(self) -> List[dict]:
+        """Download every book the user has saved, one page at a time"""
+        books: List[dict] = []
+        while True:
+            page = self.get_json(
+                "https://api.bookbeat.com/api/my/books/saved",
+                params = {
+                    "offset": len(books),
+                    "limit": SAVED_BOOKS_PAGE_SIZE
+                }
+            )
+            page_books = page.get("_embedded", {}).get("savedBooks", [])
+            books.extend(page_books)
+            if len(page_books) < SAVED_BOOKS_PAGE_SIZE:
+                return books
+
+
+    def get_saved_books(self, refresh: bool = False) -> Dict[str, dict]:
+        """
+        Get saved books indexed by book id.
+        A recent copy stored on disk is used instead of downloading the list.
+
+        :param refresh: Download list even if it has already been loaded
+        :returns: Saved books by book id
+        """
+        if self._saved_books is None or refresh:
+            books = None
+            if not refresh:
+                books = self._read_snapshot(self._saved_books_snapshot, SAVED_BOOKS_MAX_AGE)
+            self._saved_books_from_snapshot = books is not None
+            if books is None:
+                books = self.download_saved_books()
+                self._write_snapshot(self._saved_books_snapshot, books)
+            self._saved_books = { str(book["bookid"]): book for book in books }
+        return self._saved_books
+
+
     def find_book_info(self, book_id: str) -> Dict:
         """Find book by id from owned books"""
-        for book in self.saved_books["_embedded"]["savedBooks"]:
-            if str(book["bookid"]) == book_id:
-                book["metadata"] = self._session.get(
-                    book["_links"]["book"]["href"]
-                ).json()
-                return book
-        raise MissingBookAccess
+        book = self.get_saved_books().get(book_id)
+        if book is None and self._saved_books_from_snapshot:
+            # The stored list can miss recently saved books
+            book = self.get_saved_books(refresh=True).get(book_id)
+        if book is None:
+            raise MissingBookAccess
+        book["metadata"] = self._session.get(
+            book["_links"]["book"]["href"]
+        ).json()
+        return book
@@ -1,8 +1,10 @@
 from .source import Source
 from audiobookdl import AudiobookFile, Chapter, logging, AudiobookMetadata, Cover, Audiobook
+from audiobookdl.utils.audiobook import part_start_times
 
 from typing import List, Optional, Tuple
 import base64
+from functools import partial
 from Crypto.Cipher import AES
 
 LOGIN_URL = "https://www.chirpbooks.com/users/sign_in"
@@ -70,23 +72,26 @@ class ChirpSource(Source):
 
 
     def get_files(self, book_id: int, key: bytes, iv: bytes, tracks) -> List[AudiobookFile]:
+        # Every track url is a separate request. They are requested by the
+        # download workers right before each track is downloaded, so
+        # downloads start without waiting for the urls of the other tracks
         files = []
         for track in tracks:
             files.append(AudiobookFile(
-                url = self.get_audio_url(book_id, key, iv, track),
+                url = f"https://www.chirpbooks.com/player/{book_id}#{track['partNumber']}-{track['chapterNumber']}",
                 ext = "mp3",
                 title = track["displayName"],
+                url_resolver = partial(self.get_audio_url, book_id, key, iv, track),
             ))
         return files
 
 
     def get_chapters(self, tracks) -> List[Chapter]:
         chapters = []
-        start_time = 0
-        for track in tracks:
+        start_times = part_start_times([ track["durationMs"] for track in tracks ])
+        for track, start_time in zip(tracks, start_times):
             title = track["displayName"]
             chapters.append(Chapter(start_time, title))
-            start_time += track["durationMs"]
         return chapters
 
 
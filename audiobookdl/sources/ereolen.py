@@ -8,7 +8,6 @@ import json
 import pycountry
 from urllib.parse import urlparse
 import importlib
-import requests
 
 class EreolenSource(Source):
     _authentication_methods = [
@@ -17,9 +16,10 @@ class EreolenSource(Source):
     ]
     names = [ "eReolen" ]
     login_data = [ "username", "password" ]
-    library_domains = utils.read_asset_file("assets/sources/ereolen/libraries.txt").split("\n")
+    # Every library has its own login
+    login_per_hostname = True
     match = [
-        rf"https://(www.)?({"|".join(library_domains)})/work/work-of:.+",
+        r"https://[^/]+/work/work-of:.+",
     ]
 
     def _login(self, url: str, username: str, password: str):
@@ -95,7 +95,7 @@ class EreolenSource(Source):
             raise DataNotPresent
 
         return Audiobook(
-            session = requests.Session(),
+            session = self._download_session,
             files = self.get_files(order_id),
             metadata = AudiobookMetadata(
                 title = metadata["titles"]["full"][0],
@@ -23,6 +23,11 @@ def get_checksum(s: str) -> str:
     return hashlib.md5(s.encode()).digest().hex().zfill(32).upper()
 
 
+# Number of books requested at a time from the want-to-read list
+WANTLIST_PAGE_SIZE = 100
+# Seconds a stored copy of the want-to-read list is used before it is downloaded again
+WANTLIST_MAX_AGE = 60 * 60
+
 
 class NextorySource(Source):
     match = [
@@ -32,12 +37,14 @@ class NextorySource(Source):
     _authentication_methods = [
         "login",
     ]
+    _login_attributes = [ "_wantlist_snapshot" ]
     APP_ID = "200"
     LOCALE = "en_GB"
 
-    # Cache for the want-to-read list so we don't refetch it per book
+    # Want-to-read list by book id so we don't refetch it per book
     # when downloading the whole list as a Series.
-    _wantlist_cache: Optional[List[dict]] = None
+    _wantlist: Optional[Dict[int, dict]] = None
+    _wantlist_from_snapshot = False
 
 
     @staticmethod
@@ -51,6 +58,7 @@ class NextorySource(Source):
         return f"{d.year}-{d.month}-{d.day}"
 
     def _login(self, url: str, username: str, password: str):
+        self._wantlist_snapshot = f"want_to_read_{hashlib.sha256(username.encode()).hexdigest()[:16]}"
         device_id = self.create_device_id()
         logging.debug(f"{device_id=}")
         self._session.headers.update(
@@ -123,7 +131,7 @@ class NextorySource(Source):
 
 
     def download_from_id(self, book_id: int) -> Audiobook:
-        book_info = self.find_book_info(book_id, self._get_wantlist())
+        book_info = self.find_book_info(book_id)
         logging.debug(f"nextory book_info keys: {sorted(book_info.keys())}")
         audio_data = self.download_audio_data(book_info)
         if "files" not in audio_data:
@@ -145,17 +153,32 @@ class NextorySource(Source):
         return "want-to-read" in url.lower()
 
 
-    def _get_wantlist(self) -> List[dict]:
-        """Return the want-to-read list, fetching it at most once per source."""
-        if self._wantlist_cache is None:
-            self._wantlist_cache = self.download_want_to_read_list()
-        return self._wantlist_cache
+    def _get_wantlist(self, refresh: bool = False) -> Dict[int, dict]:
+        """
+        Return the want-to-read list indexed by book id, fetching it at most
+        once per source. A recent copy stored on disk is used if available.
+
+        :param refresh: Download list even if it has already been loaded
+        :returns: Books on the want-to-read list by id
+        """
+        if self._wantlist is None or refresh:
+            books = None
+            if not refresh:
+                books = self._read_snapshot(self._wantlist_snapshot, WANTLIST_MAX_AGE)
+            self._wantlist_from_snapshot = books is not None
+            if books is None:
+                books = self.download_want_to_read_list()
+                self._write_snapshot(self._wantlist_snapshot, books)
+            self._wantlist = { book["id"]: book for book in books }
+        return self._wantlist
 
 
     def _download_wantlist(self) -> Series[int]:
         """Build a Series of every audiobook currently on the want-to-read list."""
         books: List[Union[BookId[int], Audiobook]] = []
-        for book_info in self._get_wantlist():
+        # The stored list can miss recently added books, so it is only used
+        # to look up single books
+        for book_info in self._get_wantlist(refresh=True).values():
             try:
                 self.find_format_data(book_info)
             except DataNotPresent:
@@ -168,18 +191,20 @@ class NextorySource(Source):
         )
 
 
-    def find_book_info(self, book_id: int, want_to_read_list: list) -> dict:
+    def find_book_info(self, book_id: int) -> dict:
         """
-        Find metadata about book in list of active books
+        Find metadata about book in the want-to-read list
 
-        :param format_id: Id of audio format
-        :param want_to_read_list: List of books the user want to read
+        :param book_id: Id of book
         :returns: Book metadata
         """
-        for book in want_to_read_list:
-            if book["id"] == book_id:
-                return book
-        raise AudiobookDLException(error_description = "nextory_want_to_read")
+        book = self._get_wantlist().get(book_id)
+        if book is None and self._wantlist_from_snapshot:
+            # The stored list can miss recently added books
+            book = self._get_wantlist(refresh=True).get(book_id)
+        if book is None:
+            raise AudiobookDLException(error_description = "nextory_want_to_read")
+        return book
 
 
     def download_want_to_read_id(self) -> str:
@@ -198,15 +223,23 @@ class NextorySource(Source):
 
 
     def download_want_to_read_list(self) -> List[dict]:
+        """Download every book on the want-to-read list, one page at a time"""
         want_to_read_id = self.download_want_to_read_id()
-        return self._session.get(
-            "https://api.nextory.com/library/v1/me/product_lists/want_to_read/products",
-            params = {
-                "page": "0",
-                "per": "1000",
-                "id": want_to_read_id
-            }
-        ).json()["products"]
+        books: List[dict] = []
+        page = 0
+        while True:
+            products = self._session.get(
+                "https://api.nextory.com/library/v1/me/product_lists/want_to_read/products",
+                params = {
+                    "page": str(page),
+                    "per": str(WANTLIST_PAGE_SIZE),
+                    "id": want_to_read_id
+                }
+            ).json()["products"]
+            books.extend(products)
+            if len(products) < WANTLIST_PAGE_SIZE:
+                return books
+            page += 1
 
 
     def download_audio_data(self, book_info: dict) -> dict:
@@ -226,19 +259,14 @@ class NextorySource(Source):
 
 
     def get_files(self, audio_data) -> List[AudiobookFile]:
-        files = []
-        for file in audio_data["files"]:
-            # master url redirects to media url
-            # TODO Handle redirect correctly
-            media_url = file["uri"].replace("master", "media")
-            files.extend(
-                self.get_stream_files(
-                    media_url,
-                    headers=self._session.headers,
-                    expected_content_type=("audio/aac", "audio/x-aac", "video/MP2T"),
-                )
-            )
-        return files
+        # master url redirects to media url
+        # TODO Handle redirect correctly
+        media_urls = [ file["uri"].replace("master", "media") for file in audio_data["files"] ]
+        return self.get_streams_files(
+            media_urls,
+            headers=self._session.headers,
+            expected_content_type=("audio/aac", "audio/x-aac", "video/MP2T"),
+        )
 
 
     def get_metadata(self, book_info) -> AudiobookMetadata:
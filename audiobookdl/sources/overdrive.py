@@ -1,6 +1,7 @@
 from .source import Source
 from audiobookdl import AudiobookFile, Chapter, AudiobookMetadata, Cover, Audiobook
 from audiobookdl.exceptions import DataNotPresent, UserNotAuthorized
+from audiobookdl.utils.audiobook import part_start_times
 
 import re
 import json
@@ -50,15 +51,10 @@ class OverdriveSource(Source):
         cover_data = self.get(cover_url)
         return Cover(cover_data, "jpg")
 
-    def _get_previous_length(self, index: int, book_info) -> int:
-        """Returns the ending point of the previous part"""
-        if index == 0:
-            return 0
-        return self._get_previous_length(index-1, book_info) + \
-            book_info["spine"][index-1]["audio-duration"]
-
-    def get_chapters(self, book_info) -> List[Chapter]:
+    @staticmethod
+    def get_chapters(book_info) -> List[Chapter]:
         chapters = []
+        part_starts = part_start_times([ part["audio-duration"] for part in book_info["spine"] ])
         for chapter in book_info["nav"]["toc"]:
             timepoint = 0.
             if '#' in chapter["path"]:
@@ -67,7 +63,7 @@ class OverdriveSource(Source):
             if part_result is None:
                 continue
             part = int(part_result.group(0))-1
-            start = int((self._get_previous_length(part, book_info)+timepoint)*1000)
+            start = int((part_starts[part]+timepoint)*1000)
             chapters.append(Chapter(start, chapter["title"]))
         return chapters
 
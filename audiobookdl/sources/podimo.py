@@ -7,11 +7,15 @@ from audiobookdl.utils import http
 
 import re
 from datetime import datetime
-from typing import List
-import requests
+from functools import partial
+from typing import Iterator, List
+from multiprocessing.pool import ThreadPool
 from requests import Response
 from urllib3.util import parse_url
 
+# Number of podcast episodes requested at a time
+EPISODE_PAGE_SIZE = 100
+
 class PodimoSource(Source[dict]):
     match = [
         "https://open.podimo.com/audiobook/[^/]+",
@@ -134,20 +138,50 @@ class PodimoSource(Source[dict]):
         return response.json()["data"]["podcastById"]
 
 
-    def download_podcast_episode_ids(self, podcast_id: str) -> List:
+    def download_podcast_episode_ids(self, podcast_id: str) -> Iterator[BookId[dict]]:
+        """
+        Iterate over every episode of a podcast.
+        The next page of episodes is requested in the background while the
+        episodes of the current page are downloaded.
+
+        :param podcast_id: Internal id of podcast
+        :returns: Iterator over episodes in order of publication
+        """
+        with ThreadPool(processes=1) as pool:
+            offset = 0
+            next_page = pool.apply_async(self.download_podcast_episode_page, (podcast_id, offset))
+            while True:
+                episodes = next_page.get()
+                offset += len(episodes)
+                is_last_page = len(episodes) < EPISODE_PAGE_SIZE
+                if not is_last_page:
+                    next_page = pool.apply_async(self.download_podcast_episode_page, (podcast_id, offset))
+                for episode in episodes:
+                    yield BookId(episode)
+                if is_last_page:
+                    return
+
+
+    def download_podcast_episode_page(self, podcast_id: str, offset: int) -> List[dict]:
+        """
+        Download a single page of podcast episodes
+
+        :param podcast_id: Internal id of podcast
+        :param offset: Number of episodes before page
+        :returns: Episode information
+        """
         response = self.graphql_request(
             operation_name = "PodcastEpisodesResultsQuery",
             query = "podcast_episodes",
             variables = {
-                "limit": 100,
-                "offset": 0,
+                "limit": EPISODE_PAGE_SIZE,
+                "offset": offset,
                 "podcastId": podcast_id,
                 "sorting": "PUBLISHED_ASCENDING"
             }
         )
-        episodes = []
-        for episode in response.json()["data"]["podcastEpisodes"]:
-            episodes.append(BookId(episode))
+        episodes: List[dict] = response.json()["data"]["podcastEpisodes"]
+        logging.debug(f"Found {len(episodes)} podcast episodes from offset {offset}")
         return episodes
 
 
@@ -156,7 +190,7 @@ class PodimoSource(Source[dict]):
         episode_id = episode_info["id"]
         podcast_id = episode_info["podcastId"]
         return Audiobook(
-            session = requests.Session(),
+            session = self._download_session,
             files = self.get_podcast_file(episode_id, podcast_id),
             metadata = self.format_podcast_metadata(episode_info),
             cover = self.download_cover(episode_info["imageUrl"])
@@ -171,6 +205,26 @@ class PodimoSource(Source[dict]):
         :param podcast_id: Internal id for podcast
         :returns: Links to all podcast audio files
         """
+        file_url = self.download_podcast_file_url(episode_id, podcast_id)
+        if "m3u8" in file_url:
+            audio_url = file_url.replace("main.m3u8", "stream_audio_high/stream.m3u8")
+            # The media host can reject requests with the Podimo login
+            return self.get_stream_files(audio_url, session=self._download_session)
+        else:
+            return [
+                AudiobookFile(
+                    url = file_url,
+                    ext = "mp3",
+                    # Media urls are short lived, so a new one is requested if
+                    # the server rejects this one
+                    url_resolver = partial(self.download_podcast_file_url, episode_id, podcast_id),
+                    url_is_resolved = True,
+                )
+            ]
+
+
+    def download_podcast_file_url(self, episode_id: str, podcast_id: str) -> str:
+        """Request short lived media url of podcast episode"""
         response = self.graphql_request(
             operation_name = "ShortLivedPodcastMediaUrlQuery",
             query = "podcast_episode_file",
@@ -179,12 +233,7 @@ class PodimoSource(Source[dict]):
                 "podcastId": podcast_id
             }
         )
-        file_url = response.json()["data"]["podcastEpisodeAudioById"]["url"]
-        if "m3u8" in file_url:
-            audio_url = file_url.replace("main.m3u8", "stream_audio_high/stream.m3u8")
-            return self.get_stream_files(audio_url)
-        else:
-            return [ AudiobookFile( url = file_url, ext = "mp3" ) ]
+        return response.json()["data"]["podcastEpisodeAudioById"]["url"]
 
 
     def format_podcast_metadata(self, episode_info) -> AudiobookMetadata:
@@ -215,7 +264,7 @@ class PodimoSource(Source[dict]):
         metadata = self.format_audiobook_metadata(book_info)
         return Audiobook(
             # Will sometimes get a 'Authentication required' message if logged in
-            session = requests.Session(),
+            session = self._download_session,
             files = self.get_audiobook_files(audiobook_id),
             metadata = self.format_audiobook_metadata(book_info),
             cover = self.download_cover(book_info["coverImage"]["url"])
@@ -223,6 +272,18 @@ class PodimoSource(Source[dict]):
 
 
     def get_audiobook_files(self, audiobook_id: str) -> List[AudiobookFile]:
+        # Media urls are short lived, so they are requested right before download
+        return [
+            AudiobookFile(
+                url = f"https://open.podimo.com/audiobook/{audiobook_id}",
+                ext = "mp3",
+                url_resolver = partial(self.download_audiobook_file_url, audiobook_id),
+            )
+        ]
+
+
+    def download_audiobook_file_url(self, audiobook_id: str) -> str:
+        """Request short lived media url of audiobook"""
         response = self.graphql_request(
             operation_name = "ShortLivedAudiobookMediaUrlQuery",
             query = "files",
@@ -230,8 +291,7 @@ class PodimoSource(Source[dict]):
                 "id": audiobook_id
             }
         )
-        audiobook_url = response.json()["data"]["audiobookAudioById"]["url"]
-        return [AudiobookFile(url = audiobook_url, ext = "mp3")]
+        return response.json()["data"]["audiobookAudioById"]["url"]
 
 
     def download_book_info(self, audiobook_id: str) -> dict:
@@ -257,5 +317,5 @@ class PodimoSource(Source[dict]):
 
     def download_cover(self, cover_url: str) -> Cover:
         # Will sometimes get a 'Authentication required' message if logged in
-        response = requests.get(cover_url)
+        response = self._download_session.get(cover_url)
         return Cover(image = response.content, extension = "png")
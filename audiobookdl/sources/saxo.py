@@ -3,12 +3,19 @@ from audiobookdl import logging, AudiobookFile, AudiobookMetadata, Chapter, Cove
 from audiobookdl.exceptions import NoSourceFound
 from audiobookdl.utils.audiobook import AESEncryption
 import re
-from typing import List
+from multiprocessing.pool import ThreadPool
+from typing import Dict, List, Sequence
+
+# Max number of books to request metadata for at once
+METADATA_BATCH_SIZE = 50
+# Number of chapter stream links or book searches requested at the same time
+REQUEST_THREADS = 8
 
 class SaxoSource(Source):
     _authentication_methods = [
         "login"
     ]
+    _login_attributes = [ "bearer_token", "user_id" ]
     names = [ "Saxo" ]
     match = [
         r"https?://(www.)?saxo.(com|dk)/[^/]+/.+"
@@ -16,6 +23,13 @@ class SaxoSource(Source):
     _APP_OS = "android"
     _APP_VERSION = "6.2.4"
 
+    def __init__(self, options):
+        super().__init__(options)
+        # Book ids by isbn
+        self._book_ids: Dict[str, str] = {}
+        # Book metadata by book id
+        self._book_metadata: Dict[str, dict] = {}
+
     def _login(self, url: str, username: str, password: str) -> None:
         resp = self.post_json(
             "https://auth-read.saxo.com/auth/token",
@@ -34,6 +48,26 @@ class SaxoSource(Source):
         logging.debug(f"{self.user_id=}")
 
 
+    def prefetch(self, urls: Sequence[str]) -> None:
+        """Search for all books and download their metadata in batches"""
+        isbns = []
+        for url in urls:
+            try:
+                isbns.append(self._extract_isbn(url))
+            except NoSourceFound:
+                continue
+        def search(isbn: str):
+            try:
+                return self._search_for_book(isbn)
+            except Exception as e:
+                # Errors are reported when the book itself is downloaded
+                logging.debug(f"Could not find book with isbn {isbn}: {e!r}")
+                return None
+        with ThreadPool(max(1, min(len(isbns), REQUEST_THREADS))) as pool:
+            book_ids = [ book_id for book_id in pool.map(search, isbns) if book_id is not None ]
+        self._get_books_metadata(book_ids)
+
+
     def download(self, url: str) -> Audiobook:
         isbn = self._extract_isbn(url)
         book_id = self._search_for_book(isbn)
@@ -55,57 +89,73 @@ class SaxoSource(Source):
         else:
             raise NoSourceFound
 
+    def _api_headers(self) -> Dict[str, str]:
+        """Headers required by the Saxo app api"""
+        return {
+            "Appauthorization": f"bearer {self.bearer_token}",
+            "App-Os": self._APP_OS,
+            "App-Version": self._APP_VERSION,
+        }
+
     def _search_for_book(self, isbn: str) -> str:
         """Search for internal book id by isbn number"""
-        logging.debug(f"Searching for book with isbn: {isbn}")
-        resp = self.get_json(
-            f"https://api-read.saxo.com/api/v2/search/user/{self.user_id}/premium/books/{isbn}?booktypefilter=Audiobook",
-            headers = {
-                "Appauthorization": f"bearer {self.bearer_token}",
-                "App-Os": self._APP_OS,
-                "App-Version": self._APP_VERSION,
-            }
-        )
-        # Selects the first search result. There should only be one
-        book_id = resp["items"][0]["bookId"]
-        return book_id
+        if isbn not in self._book_ids:
+            logging.debug(f"Searching for book with isbn: {isbn}")
+            resp = self.get_json(
+                f"https://api-read.saxo.com/api/v2/search/user/{self.user_id}/premium/books/{isbn}?booktypefilter=Audiobook",
+                headers = self._api_headers()
+            )
+            # Selects the first search result. There should only be one
+            self._book_ids[isbn] = resp["items"][0]["bookId"]
+        return self._book_ids[isbn]
 
     def _get_book_metadata(self, book_id: str) -> dict:
         """Downloads metadata about book"""
-        return self.post_json(
-            f"https://api-read.saxo.com/api/v1/book/data/user/{self.user_id}/",
-            headers = {
-                "Appauthorization": f"bearer {self.bearer_token}",
-                "App-Os": self._APP_OS,
-                "App-Version": self._APP_VERSION,
-            },
-            json = [ book_id ]
-        )["items"][0]
+        return self._get_books_metadata([ book_id ])[book_id]
+
+    def _get_books_metadata(self, book_ids: Sequence[str]) -> Dict[str, dict]:
+        """
+        Downloads metadata about multiple books. Metadata for up to
+        `METADATA_BATCH_SIZE` books is requested at once, and books that have
+        already been downloaded are not requested again.
+
+        :param book_ids: Ids of books
+        :returns: Metadata by book id
+        """
+        missing = list(dict.fromkeys(str(i) for i in book_ids if str(i) not in self._book_metadata))
+        for start in range(0, len(missing), METADATA_BATCH_SIZE):
+            items = self.post_json(
+                f"https://api-read.saxo.com/api/v1/book/data/user/{self.user_id}/",
+                headers = self._api_headers(),
+                json = missing[start:start+METADATA_BATCH_SIZE]
+            )["items"]
+            for item in items:
+                self._book_metadata[str(item["bookId"])] = item
+        return { i: self._book_metadata[str(i)] for i in book_ids if str(i) in self._book_metadata }
+
+
+    def _get_stream_link(self, book_id: str, filename: str) -> str:
+        """Get link to encrypted audio file of chapter"""
+        return self.get_json(
+            f"https://api-read.saxo.com/api/v1/book/{book_id}/content/encryptedstream/{filename}",
+            headers = self._api_headers(),
+        )["link"]
 
 
     def get_files(self, book_info) -> List[AudiobookFile]:
-        result = []
         book_id = book_info["bookId"]
-        for file in book_info["techInfo"]["chapters"]:
-            filename = file["fileName"]
-            link = self.get_json(
-                f"https://api-read.saxo.com/api/v1/book/{book_id}/content/encryptedstream/{filename}",
-                headers = {
-                    "Appauthorization": f"bearer {self.bearer_token}",
-                    "App-Os": self._APP_OS,
-                    "App-Version": self._APP_VERSION,
-                },
-            )["link"]
-            result.append(AudiobookFile(
-                url = link,
-                ext = "mp3",
-                # Encryption keys extracted from app
-                encryption_method = AESEncryption(
-                    b"CD3E9D141D8EFC0886912E7A8F3652C4",
-                    b"78CB354D377772F1",
-                )
-            ))
-        return result
+        filenames = [ file["fileName"] for file in book_info["techInfo"]["chapters"] ]
+        with ThreadPool(max(1, min(len(filenames), REQUEST_THREADS))) as pool:
+            links = pool.starmap(self._get_stream_link, [ (book_id, f) for f in filenames ])
+        # Encryption keys extracted from app
+        encryption = AESEncryption(
+            b"CD3E9D141D8EFC0886912E7A8F3652C4",
+            b"78CB354D377772F1",
+        )
+        return [
+            AudiobookFile(url = link, ext = "mp3", encryption_method = encryption)
+            for link in links
+        ]
 
     def get_metadata(self, book_info) -> AudiobookMetadata:
         metadata: dict = book_info["bookMetadata"]
@@ -1,22 +1,30 @@
 # Internal imports
 from . import networking
+from .token_store import TokenStore
 from audiobookdl import logging, AudiobookFile, Chapter, AudiobookMetadata, Cover, Result, Audiobook, BookId
-from audiobookdl.exceptions import DataNotPresent, GenericAudiobookDLException
+from audiobookdl.exceptions import AudiobookDLException, DataNotPresent, GenericAudiobookDLException, UserNotAuthorized
 from audiobookdl.utils import CustomSSLContextHTTPAdapter
 
 # External imports
 import requests
-import lxml.html
-from lxml.cssselect import CSSSelector
+from requests.adapters import HTTPAdapter
 import re
 import os
+import json
+import time
 from http.cookiejar import MozillaCookieJar
-from typing import Any, Dict, List, Optional, TypeVar, Generic
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar, Generic
 from ssl import SSLContext
 import urllib3
 
 T = TypeVar("T")
 
+# Connections kept open per host in a session. Should be at least the number
+# of files downloaded in parallel, or connections are thrown away after use
+CONNECTION_POOL_SIZE = 20
+# Seconds a stored login is reused before logging in again
+LOGIN_MAX_AGE = 60 * 60 * 12
+
 class Source(Generic[T]):
     """An abstract class for downloading audiobooks from a specific
     online source."""
@@ -29,8 +37,27 @@ class Source(Generic[T]):
     names: List[str] = []
     # Methods for authenticating
     _authentication_methods: List[str] = [ "cookies" ]
+    # Logins are only valid on the hostname of the url used to log in, like
+    # the libraries of eReolen. Urls with other hostnames need their own source
+    login_per_hostname: bool = False
     # Create database directory for source
     create_storage_dir: bool = False
+    # Attributes set by `_login` that are stored together with session headers
+    # and cookies, so the login can be reused later. `None` if logins of the
+    # source can't be stored. Must never include the password or anything
+    # that can be used instead of it
+    _login_attributes: Optional[List[str]] = None
+    # Seconds a stored login is reused
+    _login_max_age: float = LOGIN_MAX_AGE
+    # Login data except the password of the current login
+    _login_identity: Optional[Dict[str, str]] = None
+    # Login data except the password, if the login was restored from storage
+    _restored_identity: Optional[Dict[str, str]] = None
+    # If a request was rejected with status 401 after the login was restored
+    _restored_login_rejected = False
+    # Asks the user for the password. Used by sources that have to log in
+    # again after the login was restored without a password
+    ask_password: Optional[Callable[[], str]] = None
     # If cookies are loaded
     __authenticated = False
     # Cache of previously loaded pages
@@ -39,7 +66,12 @@ class Source(Generic[T]):
     def __init__(self, options: Any):
         self.database_directory = os.path.join(options.database_directory, self.name)
         self.skip_downloaded = options.skip_downloaded
+        self._options = options
         self._session: requests.Session = self.create_session(options)
+        self.__download_session: Optional[requests.Session] = None
+        self._token_store: Optional[TokenStore] = None
+        if not getattr(options, "no_token_cache", False):
+            self._token_store = TokenStore(options.database_directory)
         if self.create_storage_dir:
             os.makedirs(self.database_directory, exist_ok=True)
 
@@ -50,6 +82,18 @@ class Source(Generic[T]):
         return self.names[0].lower()
 
 
+    @property
+    def _download_session(self) -> requests.Session:
+        """
+        Session without authentication for downloading files from hosts that
+        reject authenticated requests. It is created once per source, so all
+        books from the source reuse the same connections.
+        """
+        if self.__download_session is None:
+            self.__download_session = self.create_session(self._options)
+        return self.__download_session
+
+
     @property
     def requires_authentication(self):
         """Returns `True` if this source requires authentication to download books"""
@@ -94,6 +138,109 @@ class Source(Generic[T]):
             logging.debug("Logging in")
             self._login(url, **kwargs)
             self.__authenticated = True
+            self._login_identity = { key: value for key, value in kwargs.items() if key != "password" }
+            if self._token_store is not None and self._login_attributes is not None:
+                self._token_store.save(self.name, self._login_identity, self._login_state(), self._login_max_age)
+
+
+    def restore_login(self, **identity: str) -> bool:
+        """
+        Restore login stored by an earlier login with the same login data
+
+        :param identity: Login data except the password
+        :returns: `True` if the source is authenticated
+        """
+        if self._token_store is None or self._login_attributes is None:
+            return False
+        state = self._token_store.load(self.name, identity)
+        if state is None:
+            return False
+        logging.debug("Using stored login")
+        self._headers_before_restore = dict(self._session.headers)
+        self._session.headers.update(state["headers"])
+        for cookie in state["cookies"]:
+            self._session.cookies.set(**cookie)
+        for attribute, value in state["attributes"].items():
+            if attribute in self._login_attributes:
+                setattr(self, attribute, value)
+        self.__authenticated = True
+        self._login_identity = dict(identity)
+        self._restored_identity = dict(identity)
+        self._restored_login_rejected = False
+        return True
+
+
+    @property
+    def login_restored(self) -> bool:
+        """Returns `True` if the source uses a login restored from storage"""
+        return self._restored_identity is not None
+
+
+    def restored_login_rejected(self, error: AudiobookDLException) -> bool:
+        """
+        Check if `error` was caused by the source rejecting a restored login,
+        because it was revoked or expired earlier than expected
+
+        :param error: Error raised while using the source
+        """
+        return self.login_restored \
+            and (isinstance(error, UserNotAuthorized) or self._restored_login_rejected)
+
+
+    def forget_login(self) -> None:
+        """Remove restored login from storage and session, so the source can log in again"""
+        if self._restored_identity is None:
+            return
+        logging.debug("Stored login was rejected")
+        if self._token_store is not None:
+            self._token_store.delete(self.name, self._restored_identity)
+        self._session.headers.clear()
+        self._session.headers.update(self._headers_before_restore)
+        self._session.cookies.clear()
+        self._login_identity = None
+        self._restored_identity = None
+        self._restored_login_rejected = False
+        self.__authenticated = False
+
+
+    def _update_stored_login(self) -> None:
+        """
+        Store login attributes changed after login, like counters, with the
+        stored login. The stored login still expires at the same time.
+        """
+        if self._token_store is not None and self._login_attributes is not None and self._login_identity is not None:
+            self._token_store.update(self.name, self._login_identity, self._login_state())
+
+
+    def _check_unauthorized(self, response: requests.Response, *args, **kwargs) -> None:
+        """Session response hook noticing when a restored login is rejected"""
+        if response.status_code == 401 and self.login_restored:
+            self._restored_login_rejected = True
+
+
+    def _login_state(self) -> Dict[str, Any]:
+        """Session headers, cookies, and login attributes of source"""
+        return {
+            "headers": dict(self._session.headers),
+            "cookies": [
+                { "name": c.name, "value": c.value, "domain": c.domain, "path": c.path }
+                for c in self._session.cookies
+            ],
+            "attributes": {
+                attribute: getattr(self, attribute)
+                for attribute in self._login_attributes or []
+                if hasattr(self, attribute)
+            },
+        }
+
+
+    def prefetch(self, urls: Sequence[str]) -> None:
+        """
+        Called with every url that will be downloaded from this source before
+        any of them are downloaded. Sources can use this to request data for
+        many books at once.
+        """
+        pass
 
 
     def download_from_id(self, book_id: T) -> Audiobook:
@@ -142,6 +289,9 @@ class Source(Generic[T]):
         Find all html elements in the page from `url` that's matches `selector`.
         Will cache the page.
         """
+        # lxml is only imported by sources that scrape html pages
+        import lxml.html
+        from lxml.cssselect import CSSSelector
         sel = CSSSelector(selector)
         page: bytes = self._get_page(url, **kwargs)
         tree = lxml.html.fromstring(page.decode("utf8"))
@@ -169,12 +319,43 @@ class Source(Generic[T]):
         """
         return re.findall(regex, self._get_page(url, **kwargs).decode("utf8"))
 
+    def _read_snapshot(self, name: str, max_age: float) -> Optional[Any]:
+        """
+        Read data stored with `_write_snapshot`
+
+        :param name: Name of snapshot
+        :param max_age: Max age of snapshot in seconds
+        :returns: Stored data or `None` if the snapshot is missing or too old
+        """
+        path = os.path.join(self.database_directory, f"{name}.json")
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                return None
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+    def _write_snapshot(self, name: str, data: Any) -> None:
+        """
+        Store data in database directory of source
+
+        :param name: Name of snapshot
+        :param data: Json serializable data
+        """
+        os.makedirs(self.database_directory, exist_ok=True)
+        path = os.path.join(self.database_directory, f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(data, f)
+
     # Networking
     post = networking.post
     get = networking.get
     post_json = networking.post_json
     get_json = networking.get_json
     get_stream_files = networking.get_stream_files
+    get_streams_files = networking.get_streams_files
 
     def create_ssl_context(self, options: Any) -> SSLContext:
         try:
@@ -196,5 +377,8 @@ class Source(Generic[T]):
         session = requests.Session()
         ssl_context: SSLContext = self.create_ssl_context(options)
         # session.adapters.pop("https://", None)
-        session.mount("https://", CustomSSLContextHTTPAdapter(ssl_context))
+        session.mount("https://", CustomSSLContextHTTPAdapter(ssl_context, pool_maxsize=CONNECTION_POOL_SIZE))
+        session.mount("http://", HTTPAdapter(pool_maxsize=CONNECTION_POOL_SIZE))
+        session.hooks["response"].append(networking.record_response)
+        session.hooks["response"].append(self._check_unauthorized)
         return session
@@ -1,12 +1,33 @@
-from audiobookdl import AudiobookFile, exceptions, logging
+from audiobookdl import AudiobookFile, exceptions, logging, metrics, profiling
 from audiobookdl.utils.audiobook import AESEncryption
 
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple
+from multiprocessing.pool import ThreadPool
 import json
 import os
+import time
+from urllib.parse import urljoin, urlsplit
 import m3u8
 import requests
 
+# Max number of playlists and keys downloaded at the same time
+STREAM_RESOLVE_THREADS = 8
+
+
+def record_response(response: requests.Response, *args, **kwargs) -> None:
+    """Session response hook measuring request latency by host"""
+    host = urlsplit(response.url).hostname or ""
+    elapsed = response.elapsed.total_seconds()
+    metrics.observe("http_request_seconds", elapsed, host=host)
+    profiling.add_span(
+        f"{response.request.method} {host}",
+        time.perf_counter() - elapsed,
+        elapsed,
+        url = response.url,
+        status = response.status_code
+    )
+    metrics.increment("http_requests_total", host=host, status=str(response.status_code))
+
 
 def post(self, url: str, **kwargs) -> bytes:
     """Make post request with `Source` session"""
@@ -45,28 +66,133 @@ def get_json(self, url: str, **kwargs) -> dict:
     return json.loads(resp.decode('utf8'))
 
 
-def get_stream_files(self, url: str, headers={}, extension=None, expected_content_type="application/octet-stream") -> List[AudiobookFile]:
+def get_stream_files(self, url: str, headers={}, extension=None, expected_content_type="application/octet-stream", session: Optional[requests.Session] = None) -> List[AudiobookFile]:
     """Creates a list of audio files from an m3u8 file"""
-    playlist = m3u8.load(url, headers=headers)
+    return get_streams_files(self, [url], headers, extension, expected_content_type, session)
+
+
+def get_streams_files(self, urls: Sequence[str], headers={}, extension=None, expected_content_type="application/octet-stream", session: Optional[requests.Session] = None) -> List[AudiobookFile]:
+    """
+    Creates a list of audio files from multiple m3u8 files.
+    Playlists are downloaded concurrently and every distinct encryption key is
+    only downloaded once.
+
+    :param urls: Urls of m3u8 playlists
+    :param headers: Headers used for playlist, key and file requests
+    :param extension: Output file extension. Found from segment urls if `None`
+    :param expected_content_type: Expected content-type of the segments
+    :param session: Session used for playlist and key requests. Defaults to the
+    `Source` session
+    :returns: Audio files from all playlists in the order of `urls`
+    """
+    if session is None:
+        session = self._session
+    threads = max(1, min(len(urls), STREAM_RESOLVE_THREADS))
+    with ThreadPool(processes=threads) as pool:
+        playlists = pool.map(metrics.in_current_scope(lambda url: _load_playlist(session, url, headers)), urls)
+        key_uris: List[str] = []
+        for playlist in playlists:
+            for key in playlist.keys:
+                if _is_encrypted(key) and key.absolute_uri not in key_uris:
+                    key_uris.append(key.absolute_uri)
+        keys = dict(zip(
+            key_uris,
+            pool.map(metrics.in_current_scope(lambda uri: _load_key(session, uri, headers)), key_uris)
+        ))
+    files = []
+    for playlist in playlists:
+        files.extend(_playlist_files(playlist, keys, headers, extension, expected_content_type))
+    return files
+
+
+def _load_playlist(session: requests.Session, url: str, headers) -> m3u8.M3U8:
+    """Download and parse m3u8 playlist"""
+    resp = session.get(url, headers=headers)
+    if resp.status_code != 200:
+        logging.debug(f"Failed to download playlist from: {url}\nResponse:\n{resp.content!r}")
+        raise exceptions.RequestError
+    # Segment and key uris are relative to the final location of the playlist
+    return m3u8.loads(resp.text, uri=resp.url)
+
+
+def _load_key(session: requests.Session, uri: str, headers) -> bytes:
+    """Download encryption key of playlist"""
+    resp = session.get(uri, headers=headers)
+    if resp.status_code != 200:
+        logging.debug(f"Failed to download key from: {uri}\nResponse:\n{resp.content!r}")
+        raise exceptions.RequestError
+    return resp.content
+
+
+def _is_encrypted(key) -> bool:
+    """Returns `True` if `key` is an actual encryption key"""
+    return hasattr(key, "method") and not key.method == "NONE"
+
+
+def _playlist_files(playlist: m3u8.M3U8, keys: Dict[str, bytes], headers, extension: Optional[str], expected_content_type) -> List[AudiobookFile]:
+    """Creates audio files from the segments of a parsed playlist"""
     files = []
-    for _, seg in enumerate(playlist.segments):
+    # Segments sharing key and iv also share the same encryption object
+    encryptions: Dict[Tuple[str, bytes], AESEncryption] = {}
+    for seg in playlist.segments:
+        url = _resolve_uri(seg.base_uri, seg.uri)
         if extension is None:
-            extension = os.path.splitext(seg.absolute_uri)[1][1:].split("?")[0]
-        current = AudiobookFile(
-            url = seg.absolute_uri,
+            extension = os.path.splitext(url)[1][1:].split("?")[0]
+        encryption_method = None
+        if _is_encrypted(seg.key):
+            key_uri = _resolve_uri(seg.key.base_uri, seg.key.uri)
+            iv = _segment_iv(seg.key.iv, seg.media_sequence)
+            if (key_uri, iv) not in encryptions:
+                encryptions[(key_uri, iv)] = AESEncryption(key = keys[key_uri], iv = iv, padding = True)
+            encryption_method = encryptions[(key_uri, iv)]
+        files.append(AudiobookFile(
+            url = url,
             ext = extension,
             headers = headers,
+            encryption_method = encryption_method,
             expected_content_type = expected_content_type
-        )
-        if hasattr(seg.key, "method") and not seg.key.method == "NONE":
-            current.encryption_method = AESEncryption(
-                key = self._get_page(seg.key.absolute_uri, headers=headers),
-                iv = int(seg.key.iv, 0).to_bytes(16, byteorder='big')
-            )
-        files.append(current)
+        ))
     return files
 
 
+def _resolve_uri(base_uri: Optional[str], uri: str) -> str:
+    """
+    Resolve uri from playlist.
+    Plain relative paths are appended to the base uri of the playlist, which
+    avoids reparsing the same prefix for every segment.
+
+    :param base_uri: Uri of the directory the playlist is located in
+    :param uri: Absolute or relative uri from playlist
+    :returns: Absolute uri
+    """
+    path = uri.split("?", 1)[0]
+    is_plain_relative_path = not (
+        path.startswith(("/", "."))
+        or "/." in path
+        or ":" in path.split("/", 1)[0]
+        or "#" in uri
+    )
+    if base_uri and is_plain_relative_path:
+        return base_uri + uri
+    return urljoin(base_uri or "", uri)
+
+
+def _segment_iv(key_iv: Optional[str], media_sequence: Optional[int]) -> bytes:
+    """
+    Find iv for segment in HLS stream.
+
+    The iv of the key is used if it is given. Otherwise the media sequence
+    number of the segment is used as iv as described in RFC 8216 section 5.2.
+
+    :param key_iv: Hexadecimal iv from `EXT-X-KEY` tag
+    :param media_sequence: Media sequence number of segment
+    :returns: 16 byte iv
+    """
+    if key_iv:
+        return int(key_iv, 16).to_bytes(16, byteorder="big")
+    return (media_sequence or 0).to_bytes(16, byteorder="big")
+
+
 def _get_all_cookies(session: requests.Session) -> Dict[str, str]:
     """
     Retrieves all cookies from session
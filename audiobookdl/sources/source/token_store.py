@@ -0,0 +1,100 @@
+from audiobookdl import logging
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Mapping, Optional
+
+class TokenStore:
+    """
+    Stores login state of sources on disk, so logins can be reused between runs.
+    Entries are not encrypted. Like cookie files, they are only protected by
+    file permissions that let no one but the current user read them.
+    Passwords, or anything that can be used as one, should never be stored.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+
+    def load(self, name: str, identity: Mapping[str, str]) -> Optional[Any]:
+        """
+        Load stored login state
+
+        :param name: Name of source
+        :param identity: Non-secret login data, like the username
+        :returns: Stored data or `None` if nothing valid is stored
+        """
+        try:
+            with open(self._entry_path(name, identity), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("identity") != dict(identity) or entry.get("expires", 0) < time.time():
+            logging.debug(f"Stored login for {name} is expired")
+            return None
+        return entry.get("data")
+
+
+    def save(self, name: str, identity: Mapping[str, str], data: Any, max_age: float) -> None:
+        """
+        Store login state
+
+        :param name: Name of source
+        :param identity: Non-secret login data, like the username
+        :param data: Json serializable login state
+        :param max_age: Seconds the login state is valid
+        """
+        entry = {
+            "identity": dict(identity),
+            "expires": time.time() + max_age,
+            "data": data,
+        }
+        path = self._entry_path(name, identity)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with _open_private(path) as f:
+            f.write(json.dumps(entry))
+
+
+    def update(self, name: str, identity: Mapping[str, str], data: Any) -> None:
+        """
+        Replace data of stored login state without changing when it expires.
+        Nothing is stored if there is no valid entry.
+
+        :param name: Name of source
+        :param identity: Non-secret login data, like the username
+        :param data: Json serializable login state
+        """
+        path = self._entry_path(name, identity)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return
+        if entry.get("identity") != dict(identity) or entry.get("expires", 0) < time.time():
+            return
+        entry["data"] = data
+        with _open_private(path) as f:
+            f.write(json.dumps(entry))
+
+
+    def delete(self, name: str, identity: Mapping[str, str]) -> None:
+        """Remove stored login state, for example after it was rejected by the source"""
+        try:
+            os.remove(self._entry_path(name, identity))
+        except FileNotFoundError:
+            pass
+
+
+    def _entry_path(self, name: str, identity: Mapping[str, str]) -> str:
+        identity_hash = hashlib.sha256(json.dumps(dict(identity), sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.directory, name, f"login_{identity_hash[:16]}.json")
+
+
+def _open_private(path: str):
+    """Open file for writing that only the current user can read"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # Files that already existed keep their permissions when opened
+    os.chmod(path, 0o600)
+    return os.fdopen(fd, "w")
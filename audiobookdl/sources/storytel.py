@@ -20,6 +20,7 @@ from audiobookdl.exceptions import (
     BookNotReleased,
     DataNotPresent,
 )
+from audiobookdl.utils.audiobook import part_start_times
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad
 from typing import Any, List, Dict, Optional, Union
@@ -104,6 +105,11 @@ class StorytelSource(Source):
     _authentication_methods = [
         "login",
     ]
+    # The encrypted password can be decrypted and used to log in, so it is
+    # never stored. The download counter is stored, so the regular re-login
+    # also happens when every book is downloaded in a new run
+    _login_attributes = [ "_url", "_username", "_language", "_download_counter" ]
+    _password: Optional[str] = None
     _download_counter = 0
     create_storage_dir = True
 
@@ -204,7 +210,13 @@ class StorytelSource(Source):
         """
         if self._download_counter > 0 and self._download_counter % 10 == 0:
             logging.debug("refreshing login")
+            if self._password is None:
+                # Login was restored from storage without the password
+                if self.ask_password is None:
+                    raise UserNotAuthorized
+                self._password = self.encrypt_password(self.ask_password())
             self._do_login()
+            self._update_stored_login()
 
     @staticmethod
     def _clean_share_url(url: str) -> str:
@@ -469,6 +481,7 @@ class StorytelSource(Source):
             allow_redirects=False,
         )
         self._download_counter += 1
+        self._update_stored_login()
         if resp.status_code != 302:
             raise GenericAudiobookDLException(
                 f"request to {resp.url} failed, got {resp.status_code} response: {resp.text}"
@@ -566,8 +579,10 @@ class StorytelSource(Source):
         file_metadata = self.download_audiobook_info(book_details)
         if not "chapters" in file_metadata:
             return []
-        start_time = 0
-        for chapter in file_metadata["chapters"]:
+        start_times = part_start_times(
+            [chapter["durationInMilliseconds"] for chapter in file_metadata["chapters"]]
+        )
+        for chapter, start_time in zip(file_metadata["chapters"], start_times):
             if "title" in chapter and chapter["title"] is not None:
                 title = chapter["title"]
                 # remove book title prefix from chapter title
@@ -576,7 +591,6 @@ class StorytelSource(Source):
             else:
                 title = f"Chapter {chapter['number']}"
             chapters.append(Chapter(start_time, title))
-            start_time += chapter["durationInMilliseconds"]
         return chapters
 
     def download_cover(self, book_details) -> Cover:
@@ -18,6 +18,7 @@ class YourCloudLibrarySource(Source):
         "cookies",
         "login"
     ]
+    _login_attributes = []
 
     def download(self, url: str) -> Audiobook:
         url = self.get_listening_url(url)
@@ -1,28 +1,40 @@
+import functools
 import importlib.resources
-from typing import Sequence
+from typing import Optional, Sequence
 import shutil
 from urllib3.poolmanager import PoolManager
 from requests.adapters import HTTPAdapter
 from ssl import SSLContext
 
 
-def levenstein_distance(a: str, b: str) -> int:
+def levenstein_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
     """
     Calculates the levenstein distance between `a` and `b`
 
     https://en.wikipedia.org/wiki/Levenshtein_distance
+
+    :param max_distance: Stop calculating when the distance is known to be
+    larger than `max_distance`. `max_distance + 1` is returned in that case.
+    :returns: Levenstein distance
     """
-    if len(a) == 0:
-        return len(b)
-    if len(b) == 0:
-        return len(a)
-    if a[0] == b[0]:
-        return levenstein_distance(a[1:], b[1:])
-    return 1 + min(
-        levenstein_distance(a, b[1:]), # Character is inserted
-        levenstein_distance(a[1:], b), # Character is deleted
-        levenstein_distance(a[1:], b[1:]) # Character is replaced
-    )
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    # Distances between the first `i` characters of `a` and prefixes of `b`
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1, # Character is deleted
+                current[j-1] + 1, # Character is inserted
+                previous[j-1] + (char_a != char_b) # Character is replaced
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
 
 
 def nearest_string(input: str, list: Sequence[str]) -> str:
@@ -30,12 +42,22 @@ def nearest_string(input: str, list: Sequence[str]) -> str:
     Returns the closest element in `list` to `input` based on the levenstein
     distance
     """
-    return sorted(list, key = lambda x: levenstein_distance(input, x))[0]
+    best = list[0]
+    best_distance = levenstein_distance(input, best)
+    for candidate in list[1:]:
+        if best_distance == 0:
+            break
+        distance = levenstein_distance(input, candidate, best_distance - 1)
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+    return best
 
 
+@functools.lru_cache(maxsize=None)
 def read_asset_file(path: str) -> str:
     """
     Read audiobook-dl asset file.
+    Files are only read once and are kept in memory afterwards.
 
     :param path: the path of the asset file relative to the audiobook-dl root dir
     :returns: the content of the asset file
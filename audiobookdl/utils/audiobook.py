@@ -1,10 +1,14 @@
 from datetime import date
 import requests
-from typing import Dict, Generic, List, Optional, Union, Sequence, Tuple, TypeVar, Any, MutableMapping
+from typing import Callable, Dict, Generic, Iterable, List, Mapping, Optional, Union, Sequence, Tuple, TypeVar, Any
+import itertools
 import json
-from attrs import define, Factory
+from types import MappingProxyType
+from attrs import define, field, frozen, setters, Attribute, Factory
 import pycountry
 
+T_Number = TypeVar("T_Number", int, float)
+
 
 @define
 class Chapter:
@@ -14,74 +18,148 @@ class Chapter:
     title: str
 
 
+def part_start_times(durations: Iterable[T_Number]) -> List[T_Number]:
+    """
+    Find start times of consecutive parts from their durations.
+    Index `n` is the start of part `n`; the last element is the total length.
+
+    :param durations: Duration of each part in order
+    :returns: Running total of `durations` starting with 0
+    """
+    return list(itertools.accumulate(durations, initial=0))
+
+
 @define
 class Cover:
     image: bytes
     extension: str
 
 
-@define
+@frozen
 class AESEncryption:
     key: bytes
     iv: bytes
+    # Remove PKCS#7 padding from the end of the decrypted file
+    padding: bool = False
 
 
 AudiobookFileEncryption = AESEncryption
 
+# Shared by all files that do not need extra headers. Books can have tens of
+# thousands of files, so they should not each carry their own empty dict.
+NO_HEADERS: Mapping[str, Union[str, bytes]] = MappingProxyType({})
 
-@define
+
+@frozen
 class AudiobookFile:
-    # Url to audio file
+    # Url to audio file. Only used to identify the file if `url_resolver` is set
     url: str
     # Output file extension
     ext: str
     # Title of file
     title: Optional[str] = None
-    # Headers for request
-    headers: MutableMapping[str, Union[str, bytes]] = Factory(dict)
+    # Headers for request. Usually shared between all files of a book
+    headers: Mapping[str, Union[str, bytes]] = NO_HEADERS
     # Encryption method
     encryption_method: Optional[AudiobookFileEncryption] = None
     # Expected content-type of the download request
     expected_content_type: Optional[str] = None
     # Expected status code of the download request
     expected_status_code: int = 200
-
-
-@define
+    # Creates a new url for the file. Used for signed urls that can expire
+    # before the file is downloaded. Called right before the download starts
+    # and again if the server rejects the url
+    url_resolver: Optional[Callable[[], str]] = None
+    # `url` was just created by `url_resolver` and is used for the first
+    # download attempt. The resolver is then only called if the url is rejected
+    url_is_resolved: bool = False
+
+
+class AudiobookMetadataJSONEncoder(json.JSONEncoder):
+    def default(self, z):
+        if isinstance(z, date):
+            return str(z)
+        elif isinstance(z, pycountry.db.Data) and z.__class__.__name__ == "Language":
+            return z.alpha_3
+        else:
+            return super().default(z)
+
+
+@frozen
+class MetadataSnapshot:
+    """Serialised forms of `AudiobookMetadata`. Created by `AudiobookMetadata.snapshot`"""
+    # Properties with lists concatenated. Used for output templates
+    template: Mapping[str, Any]
+    # Properties with original lists. Used for tagging audio files
+    tags: Tuple[Tuple[str, Any], ...]
+    # Metadata as json
+    json: bytes
+
+
+def _invalidate_snapshot(metadata: "AudiobookMetadata", attribute: Attribute, value: Any) -> Any:
+    """Remove cached snapshot when a field of `metadata` is changed"""
+    if attribute.name != "_snapshot":
+        metadata._snapshot = None
+    return value
+
+
+@define(on_setattr=setters.pipe(setters.convert, setters.validate, _invalidate_snapshot))
 class AudiobookMetadata:
     title: str
     scrape_url: Optional[str] = None
     series: Optional[str] = None
     series_order: Optional[int] = None
-    authors: List[str] = Factory(list)
-    narrators: List[str] = Factory(list)
-    genres: List[str] = Factory(list)
+    # Lists are stored as tuples, so they can only be changed by replacing
+    # them, which removes the cached snapshot
+    authors: Tuple[str, ...] = field(default=(), converter=tuple)
+    narrators: Tuple[str, ...] = field(default=(), converter=tuple)
+    genres: Tuple[str, ...] = field(default=(), converter=tuple)
     language: Optional["pycountry.db.Language"] = None # type: ignore
     description: Optional[str] = None
     isbn: Optional[str] = None
     publisher: Optional[str] = None
     release_date: Optional[date] = None
+    # Cache for `snapshot`
+    _snapshot: Optional[MetadataSnapshot] = field(default=None, init=False, eq=False, repr=False)
 
     def add_author(self, author: str):
         """Add author to metadata"""
-        self.authors.append(author)
+        self.authors = (*self.authors, author)
 
     def add_narrator(self, narrator: str):
         """Add narrator to metadata"""
-        self.narrators.append(narrator)
+        self.narrators = (*self.narrators, narrator)
 
     def add_genre(self, genre: str):
         """Add genre to metadata"""
-        self.genres.append(genre)
+        self.genres = (*self.genres, genre)
 
     def add_authors(self, authors: Sequence[str]):
-        self.authors.extend(authors)
+        self.authors = (*self.authors, *authors)
 
     def add_narrators(self, narrators: Sequence[str]):
-        self.narrators.extend(narrators)
+        self.narrators = (*self.narrators, *narrators)
 
     def add_genres(self, genres: Sequence[str]):
-        self.genres.extend(genres)
+        self.genres = (*self.genres, *genres)
+
+    def snapshot(self) -> MetadataSnapshot:
+        """
+        Serialised forms of metadata. They are only created once and are
+        reused until the metadata is changed.
+
+        :returns: Snapshot of metadata
+        """
+        if self._snapshot is None:
+            self._snapshot = MetadataSnapshot(
+                template = MappingProxyType(self.all_properties_dict()),
+                tags = tuple(
+                    (key, list(value) if isinstance(value, tuple) else value)
+                    for key, value in self.all_properties(allow_duplicate_keys=None)
+                ),
+                json = json.dumps(self.as_dict(), cls=AudiobookMetadataJSONEncoder).encode(),
+            )
+        return self._snapshot
 
     def all_properties(self, allow_duplicate_keys = False) -> List[Tuple[str, Any]]:
         result: List[Tuple[str, str]] = []
@@ -142,9 +220,9 @@ class AudiobookMetadata:
         """
         result: dict = {
             "title": self.title,
-            "authors": self.authors,
-            "narrators": self.narrators,
-            "genres": self.genres,
+            "authors": list(self.authors),
+            "narrators": list(self.narrators),
+            "genres": list(self.genres),
         }
         if self.scrape_url:
             result["scrape_url"] = self.scrape_url
@@ -174,15 +252,7 @@ class AudiobookMetadata:
 
         :returns: Metadata as json
         """
-        class AudiobookMetadataJSONEncoder(json.JSONEncoder):
-            def default(self, z):
-                if isinstance(z, date):
-                    return str(z)
-                elif isinstance(z, pycountry.db.Data) and z.__class__.__name__ == "Language":
-                    return z.alpha_3
-                else:
-                    return super().default(z)
-        return json.dumps(self.as_dict(), cls=AudiobookMetadataJSONEncoder)
+        return self.snapshot().json.decode()
 
 
 def add_if_value_exists(metadata: AudiobookMetadata, l: List[Tuple[str, str]]):
@@ -216,8 +286,9 @@ class BookId(Generic[T]):
 class Series(Generic[T]):
     # Title of series
     title: str
-    # Internal ids of book in series
-    books: List[Union[BookId[T], Audiobook]]
+    # Internal ids of book in series. Can be an iterator for series that
+    # are listed while books are downloaded
+    books: Iterable[Union[BookId[T], Audiobook]]
 
 Result = Union[
     Audiobook,
@@ -1,4 +1,5 @@
 import requests
+from typing import Dict, Tuple
 
 
 def redirect_of(url: str, amount: int = 1) -> str | None:
@@ -17,3 +18,23 @@ def redirect_of(url: str, amount: int = 1) -> str | None:
             return None
         url = response.headers["location"]
     return url
+
+
+def connection_stats(session: requests.Session) -> Dict[str, Tuple[int, int]]:
+    """
+    Get the number of connections opened and requests sent for each host the
+    session has connected to
+
+    :param session: Session to get statistics for
+    :returns: Dictionary from host to a tuple of connections and requests
+    """
+    stats = {}
+    for adapter in session.adapters.values():
+        poolmanager = getattr(adapter, "poolmanager", None)
+        if poolmanager is None:
+            continue
+        for key in poolmanager.pools.keys():
+            pool = poolmanager.pools.get(key)
+            if pool is not None:
+                stats[f"{pool.scheme}://{pool.host}"] = (pool.num_connections, pool.num_requests)
+    return stats
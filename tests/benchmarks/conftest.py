@@ -0,0 +1,229 @@
+"""
+Local fake audiobook service and timing fixture for benchmarks.
+
+Sizes can be changed with environment variables:
+AUDIOBOOKDL_BENCHMARK_MB sets the size of each book,
+AUDIOBOOKDL_BENCHMARK_LATENCY_MS sets the latency of every response,
+AUDIOBOOKDL_BENCHMARK_ROUNDS sets how many times each benchmark is run, and
+AUDIOBOOKDL_BENCHMARK_SAVE appends results as json lines to a file, so runs
+can be compared.
+"""
+from audiobookdl import Source
+
+import http.server
+import json
+import multiprocessing
+import os
+import re
+import statistics
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+BENCHMARK_MB = float(os.environ.get("AUDIOBOOKDL_BENCHMARK_MB", "8"))
+LATENCY = float(os.environ.get("AUDIOBOOKDL_BENCHMARK_LATENCY_MS", "5")) / 1000
+ROUNDS = int(os.environ.get("AUDIOBOOKDL_BENCHMARK_ROUNDS", "3"))
+SAVE_PATH = os.environ.get("AUDIOBOOKDL_BENCHMARK_SAVE")
+
+# MPEG-1 Layer III frame at 128 kbit/s and 44.1 kHz
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+HLS_KEY = b"0123456789abcdef"
+
+
+def mp3_data(size: int) -> bytes:
+    """Silent mp3 of about `size` bytes"""
+    return MP3_FRAME * max(1, size // len(MP3_FRAME))
+
+
+# Content type of served files by extension
+CONTENT_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".ts": "application/octet-stream",
+    ".bin": "application/octet-stream",
+    ".m3u8": "application/vnd.apple.mpegurl",
+}
+
+
+class FakeService:
+    """
+    Files served by the fake audiobook service. The server runs in another
+    process, so it does not compete with the benchmarked code for the GIL.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files: Dict[str, bytes] = {}
+        self.url = ""
+
+    def add_file(self, path: str, content: bytes) -> str:
+        """Serve `content` at `path` and return its url"""
+        filepath = os.path.join(self.directory, path.lstrip("/"))
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "wb") as f:
+            f.write(content)
+        self.files[path] = content
+        return f"{self.url}{path}"
+
+    def add_book(self, name: str, file_count: int, size: int) -> List[str]:
+        """Serve book split into mp3 files with a total size of `size` bytes"""
+        content = mp3_data(size // file_count)
+        return [ self.add_file(f"/{name}/{index}.mp3", content) for index in range(file_count) ]
+
+    def add_hls_book(self, name: str, segment_count: int, size: int) -> Tuple[str, List[bytes]]:
+        """
+        Serve book as a playlist of AES-128 encrypted segments
+
+        :returns: Url of playlist and content of every segment before encryption
+        """
+        lines = [ "#EXTM3U", "#EXT-X-MEDIA-SEQUENCE:0", '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"' ]
+        segments = []
+        segment = mp3_data(size // segment_count)
+        for index in range(segment_count):
+            iv = index.to_bytes(16, "big")
+            encrypted = AES.new(HLS_KEY, AES.MODE_CBC, iv).encrypt(pad(segment, AES.block_size))
+            self.add_file(f"/{name}/segments/{index}.ts", encrypted)
+            lines += [ "#EXTINF:10,", f"segments/{index}.ts" ]
+            segments.append(segment)
+        lines.append("#EXT-X-ENDLIST")
+        self.add_file(f"/{name}/key.bin", HLS_KEY)
+        return self.add_file(f"/{name}/playlist.m3u8", "\n".join(lines).encode()), segments
+
+
+class FakeServiceHandler(http.server.BaseHTTPRequestHandler):
+    """Serves files from `directory` with range support after `latency` seconds"""
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which stalls keep-alive
+    # connections with Nagle's algorithm
+    disable_nagle_algorithm = True
+    directory = ""
+    latency = 0.
+
+    def do_HEAD(self):
+        self.respond(send_body = False)
+
+    def do_GET(self):
+        self.respond(send_body = True)
+
+    def respond(self, send_body: bool):
+        time.sleep(self.latency)
+        filepath = os.path.join(self.directory, self.path.lstrip("/"))
+        if ".." in self.path or not os.path.isfile(filepath):
+            self.send_error(404)
+            return
+        with open(filepath, "rb") as f:
+            content = f.read()
+        byte_range = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if byte_range:
+            start = int(byte_range[1] or 0)
+            end = int(byte_range[2]) + 1 if byte_range[2] else len(content)
+            self.send_response(206)
+            self.send_header("Content-range", f"bytes {start}-{end-1}/{len(content)}")
+            content = content[start:end]
+        else:
+            self.send_response(200)
+        self.send_header("Content-type", CONTENT_TYPES.get(os.path.splitext(filepath)[1], "application/octet-stream"))
+        self.send_header("Content-length", str(len(content)))
+        self.send_header("Accept-ranges", "bytes")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory: str, latency: float, connection) -> None:
+    """Run fake service and send its port through `connection`"""
+    FakeServiceHandler.directory = directory
+    FakeServiceHandler.latency = latency
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeServiceHandler)
+    server.daemon_threads = True
+    connection.send(server.server_port)
+    server.serve_forever()
+
+
+@pytest.fixture(scope="session")
+def service(tmp_path_factory):
+    fake_service = FakeService(str(tmp_path_factory.mktemp("service")))
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=serve, args=(fake_service.directory, LATENCY, sender), daemon=True)
+    process.start()
+    fake_service.url = f"http://127.0.0.1:{receiver.recv()}"
+    yield fake_service
+    process.terminate()
+    process.join()
+
+
+class FakeSource(Source):
+    names = [ "Fake" ]
+    _authentication_methods: List[str] = []
+
+
+@pytest.fixture
+def source(options, create_source) -> FakeSource:
+    options.no_token_cache = True
+    return create_source(FakeSource)
+
+
+class Benchmark:
+    """Times a function over a number of rounds"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.times: List[float] = []
+        # Bytes processed in each round. Used to report throughput
+        self.bytes: Optional[int] = None
+        # Items, like segments, processed in each round and their name.
+        # Used to report items per second
+        self.items: Optional[int] = None
+        self.unit = "items"
+        # Other measurements added to the report, like memory use
+        self.extra: Dict[str, float] = {}
+
+    def __call__(self, function: Callable, *args, **kwargs):
+        """Run `function` with the same arguments every round and return the result of the last round"""
+        return self.pedantic(function, lambda: (args, kwargs))
+
+    def pedantic(self, function: Callable, setup: Callable[[], Tuple[tuple, dict]], rounds: int = ROUNDS):
+        """Run `function` with new arguments from `setup` every round. Setup is not timed."""
+        result = None
+        for _ in range(rounds):
+            args, kwargs = setup()
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            self.times.append(time.perf_counter() - start)
+        return result
+
+    def report(self) -> Dict:
+        result = {
+            "name": self.name,
+            "rounds": len(self.times),
+            "min": min(self.times),
+            "mean": statistics.mean(self.times),
+        }
+        if self.bytes:
+            result["mb_per_second"] = self.bytes / 1024 / 1024 / result["min"]
+        if self.items:
+            result[f"{self.unit}_per_second"] = self.items / result["min"]
+        result.update(self.extra)
+        return result
+
+
+@pytest.fixture
+def benchmark(request):
+    timer = Benchmark(request.node.name)
+    yield timer
+    if not timer.times:
+        return
+    report = timer.report()
+    throughput = f", {report['mb_per_second']:.0f} MB/s" if "mb_per_second" in report else ""
+    if timer.items:
+        throughput += f", {report[f'{timer.unit}_per_second']:.0f} {timer.unit}/s"
+    for name, value in timer.extra.items():
+        throughput += f", {name} {value:.0f}"
+    print(f"\n{report['name']}: min {report['min'] * 1000:.1f} ms, mean {report['mean'] * 1000:.1f} ms{throughput}")
+    if SAVE_PATH:
+        with open(SAVE_PATH, "a") as f:
+            f.write(json.dumps({ "time": time.time(), **report }) + "\n")
@@ -0,0 +1,64 @@
+from audiobookdl import Audiobook, AudiobookFile, AudiobookMetadata
+from audiobookdl.output import download
+
+import itertools
+import os
+from conftest import BENCHMARK_MB
+
+BOOK_SIZE = int(BENCHMARK_MB * 1024 * 1024)
+FILE_COUNT = 20
+SEGMENT_COUNT = 200
+
+
+def download_arguments(audiobook: Audiobook, tmp_path):
+    """Creates arguments for `download.download_files` with a new output directory every round"""
+    rounds = itertools.count()
+    def setup():
+        output_dir = str(tmp_path / f"round{next(rounds)}")
+        os.makedirs(output_dir)
+        return (audiobook, output_dir, lambda progress: None), {}
+    return setup
+
+
+def test_download_files(service, source, tmp_path, benchmark):
+    urls = service.add_book("download_files", FILE_COUNT, BOOK_SIZE)
+    audiobook = Audiobook(
+        session = source._session,
+        metadata = AudiobookMetadata("Book"),
+        files = [ AudiobookFile(url = url, ext = "mp3") for url in urls ]
+    )
+    benchmark.bytes = BOOK_SIZE
+    filepaths = benchmark.pedantic(download.download_files, download_arguments(audiobook, tmp_path))
+    assert len(filepaths) == FILE_COUNT
+    with open(filepaths[-1], "rb") as f:
+        assert f.read() == service.files["/download_files/19.mp3"]
+
+
+def test_get_stream_files(service, source, benchmark):
+    playlist_url, _ = service.add_hls_book("get_stream_files", SEGMENT_COUNT, SEGMENT_COUNT * 16)
+    files = benchmark(source.get_stream_files, playlist_url)
+    assert len(files) == SEGMENT_COUNT
+    assert files[0].url == f"{service.url}/get_stream_files/segments/0.ts"
+    assert files[5].encryption_method.iv == (5).to_bytes(16, "big")
+
+
+def test_download_encrypted_stream(service, source, tmp_path, benchmark):
+    playlist_url, segments = service.add_hls_book("encrypted_stream", SEGMENT_COUNT, BOOK_SIZE)
+    audiobook = Audiobook(
+        session = source._session,
+        metadata = AudiobookMetadata("Book"),
+        files = source.get_stream_files(playlist_url)
+    )
+    benchmark.bytes = BOOK_SIZE
+    filepaths = benchmark.pedantic(download.download_files, download_arguments(audiobook, tmp_path))
+    for filepath, segment in zip(filepaths, segments):
+        with open(filepath, "rb") as f:
+            assert f.read() == segment
+
+
+def test_range_requests(service, source):
+    url = service.add_file("/range/book.mp3", bytes(range(256)) * 4)
+    response = source._session.get(url, headers = { "Range": "bytes=256-511" })
+    assert response.status_code == 206
+    assert response.content == bytes(range(256))
+    assert download.probe_file_size(source._session, AudiobookFile(url = url, ext = "mp3")) == 1024
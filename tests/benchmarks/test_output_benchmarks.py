@@ -0,0 +1,195 @@
+from audiobookdl import AudiobookMetadata, Chapter, Cover
+from audiobookdl.output import output
+from audiobookdl.output.encryption import AESDecryptor, decrypt_file
+from audiobookdl.output.metadata import add_metadata_to_files, ffmpeg, mp4, id3
+from audiobookdl.utils import program_in_path
+from audiobookdl.utils.audiobook import AESEncryption
+
+import io
+import itertools
+import os
+import resource
+import shutil
+import subprocess
+import tracemalloc
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from mutagen.id3 import ID3
+from mutagen.mp4 import MP4
+from conftest import BENCHMARK_MB, HLS_KEY, mp3_data
+
+BOOK_SIZE = int(BENCHMARK_MB * 1024 * 1024)
+PART_COUNT = 20
+CHAPTER_COUNT = 200
+SEGMENT_COUNT = 500
+CHUNK_SIZE = 64 * 1024
+
+requires_ffmpeg = pytest.mark.skipif(not program_in_path("ffmpeg"), reason="ffmpeg is not installed")
+
+
+def create_parts(directory, part_count: int = PART_COUNT, size: int = BOOK_SIZE):
+    """Creates setup function writing a new book split into mp3 parts every round"""
+    rounds = itertools.count()
+    content = mp3_data(size // part_count)
+    def setup():
+        part_dir = directory / f"round{next(rounds)}"
+        os.makedirs(part_dir)
+        paths = []
+        for index in range(part_count):
+            path = str(part_dir / f"Part {index:02}.mp3")
+            with open(path, "wb") as f:
+                f.write(content)
+            paths.append(path)
+        return str(part_dir), paths
+    return setup
+
+
+def create_metadata() -> AudiobookMetadata:
+    return AudiobookMetadata(
+        "Title",
+        authors = [ "Author" ],
+        narrators = [ "Narrator" ],
+        series = "Series",
+        description = "Description " * 100,
+    )
+
+
+def test_decrypt_file(tmp_path, benchmark):
+    encryption = AESEncryption(HLS_KEY, bytes(16), padding = True)
+    plain = mp3_data(BOOK_SIZE)
+    encrypted = AES.new(HLS_KEY, AES.MODE_CBC, bytes(16)).encrypt(pad(plain, AES.block_size))
+    path = str(tmp_path / "book.mp3")
+    def setup():
+        with open(path, "wb") as f:
+            f.write(encrypted)
+        return (path, encryption), {}
+    benchmark.bytes = len(encrypted)
+    benchmark.pedantic(decrypt_file, setup)
+    with open(path, "rb") as f:
+        assert f.read() == plain
+
+
+def test_streaming_decrypt(benchmark):
+    # Set AUDIOBOOKDL_BENCHMARK_MB=500 for a full size stream
+    encryption = AESEncryption(HLS_KEY, bytes(16), padding = True)
+    plain_size = len(mp3_data(BOOK_SIZE))
+    encrypted = AES.new(HLS_KEY, AES.MODE_CBC, bytes(16)).encrypt(pad(mp3_data(BOOK_SIZE), AES.block_size))
+    chunks = [ encrypted[offset:offset+CHUNK_SIZE] for offset in range(0, len(encrypted), CHUNK_SIZE) ]
+    def decrypt_stream():
+        decryptor = AESDecryptor(encryption)
+        decrypted_size = 0
+        for chunk in chunks:
+            decrypted_size += len(decryptor.update(chunk))
+        return decrypted_size + len(decryptor.finalize())
+    benchmark.bytes = len(encrypted)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    assert benchmark(decrypt_stream) == plain_size
+    # Max RSS is in KB on Linux. The encrypted stream is already in memory,
+    # so growth is the memory used by decryption
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    benchmark.extra["peak_rss_kb"] = peak_rss
+    benchmark.extra["peak_rss_growth_kb"] = peak_rss - rss_before
+    # Memory use does not grow with the size of the stream
+    tracemalloc.start()
+    decrypt_stream()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 1024 * 1024
+
+
+def test_decrypt_segments(tmp_path, benchmark):
+    segment = mp3_data(BOOK_SIZE // SEGMENT_COUNT)
+    encryptions = [ AESEncryption(HLS_KEY, index.to_bytes(16, "big"), padding = True) for index in range(SEGMENT_COUNT) ]
+    encrypted = [
+        AES.new(HLS_KEY, AES.MODE_CBC, encryption.iv).encrypt(pad(segment, AES.block_size))
+        for encryption in encryptions
+    ]
+    paths = [ str(tmp_path / f"{index}.ts") for index in range(SEGMENT_COUNT) ]
+    def setup():
+        for path, content in zip(paths, encrypted):
+            with open(path, "wb") as f:
+                f.write(content)
+        return (), {}
+    def decrypt_segments():
+        for path, encryption in zip(paths, encryptions):
+            decrypt_file(path, encryption)
+    benchmark.bytes = sum(len(content) for content in encrypted)
+    benchmark.items = SEGMENT_COUNT
+    benchmark.unit = "segments"
+    benchmark.pedantic(decrypt_segments, setup)
+    with open(paths[-1], "rb") as f:
+        assert f.read() == segment
+
+
+def test_write_chapter_file(tmp_path, benchmark):
+    _, paths = create_parts(tmp_path, part_count = 1)()
+    chapters = [ Chapter(i * 5, f"Chapter {i+1}") for i in range(CHAPTER_COUNT * 50) ]
+    def setup():
+        return (io.StringIO(), paths[0], chapters), {}
+    benchmark.pedantic(ffmpeg.write_tmp_chapter_file, setup)
+    output = io.StringIO()
+    ffmpeg.write_tmp_chapter_file(output, paths[0], chapters)
+    assert output.getvalue().count("[CHAPTER]") == len(chapters)
+
+
+def test_write_id3(tmp_path, benchmark):
+    parts = create_parts(tmp_path, part_count = 1)
+    chapters = [ Chapter(i * 1000, f"Chapter {i+1}") for i in range(CHAPTER_COUNT) ]
+    cover = Cover(os.urandom(500 * 1024), "jpg")
+    def setup():
+        _, paths = parts()
+        return (paths[0], create_metadata(), chapters, cover), {}
+    (path, *_), _ = setup()
+    benchmark.pedantic(id3.write_id3, setup)
+    id3.write_id3(path, create_metadata(), chapters, cover)
+    tags = ID3(path)
+    assert len(tags.getall("CHAP")) == CHAPTER_COUNT
+    assert tags.getall("APIC")[0].data == cover.image
+
+
+def test_add_metadata_to_files(tmp_path, benchmark):
+    parts = create_parts(tmp_path)
+    metadata = create_metadata()
+    def setup():
+        _, paths = parts()
+        return (paths, metadata, [ f"Part {i}" for i in range(len(paths)) ]), {}
+    benchmark.pedantic(add_metadata_to_files, setup)
+    _, paths = parts()
+    add_metadata_to_files(paths, metadata, [ None ] * len(paths))
+    assert all(ID3(path)["TIT2"].text == [ "Title" ] for path in paths)
+
+
+@requires_ffmpeg
+def test_combine_audiofiles(tmp_path, benchmark):
+    parts = create_parts(tmp_path)
+    def setup():
+        part_dir, paths = parts()
+        return (paths, part_dir, f"{part_dir}.mp3"), {}
+    benchmark.bytes = BOOK_SIZE
+    benchmark.pedantic(output.combine_audiofiles, setup)
+    assert os.path.getsize(tmp_path / "round0.mp3") > 0
+
+
+@requires_ffmpeg
+def test_convert_output(tmp_path, benchmark):
+    parts = create_parts(tmp_path)
+    def setup():
+        _, paths = parts()
+        return (paths, "mka"), {}
+    benchmark.bytes = BOOK_SIZE
+    converted = benchmark.pedantic(output.convert_output, setup)
+    assert all(path.endswith(".mka") and os.path.getsize(path) > 0 for path in converted)
+
+
+@requires_ffmpeg
+def test_add_mp4_metadata(tmp_path, benchmark):
+    _, paths = create_parts(tmp_path, part_count = 1)()
+    source = str(tmp_path / "book.m4a")
+    subprocess.run([ "ffmpeg", "-v", "error", "-y", "-i", paths[0], "-c:a", "aac", source ], check = True)
+    path = str(tmp_path / "tagged.m4a")
+    def setup():
+        shutil.copy(source, path)
+        return (path, create_metadata()), {}
+    benchmark.pedantic(mp4.add_mp4_metadata, setup)
+    assert MP4(path).tags["\xa9nam"] == [ "Title" ]
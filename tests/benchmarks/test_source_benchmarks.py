@@ -0,0 +1,59 @@
+from audiobookdl.sources import find_compatible_source, get_source_names
+from audiobookdl.sources.overdrive import OverdriveSource
+from audiobookdl.utils import nearest_string
+
+import subprocess
+import sys
+
+STARTUP_CODE = (
+    "from audiobookdl.sources import find_compatible_source\n"
+    "find_compatible_source('https://www.storytel.com/se/sv/books/shantaram-1404854')"
+)
+URLS = [
+    "https://www.audiobooks.com/book/stream/413879",
+    "https://www.bookbeat.no/bok/somethingsomething-999999",
+    "https://aalborgbibliotekerne.dk/work/work-of:870970-basis:12345678",
+    "https://librivox.org/library-of-the-worlds-best-literature-ancient-and-modern-volume-3-by-various/",
+    "https://open.podimo.com/podcast/some-podcast",
+    "https://www.saxo.com/dk/some-book_9788711111111",
+    "https://www.storytel.com/no/nn/books/somethingsomething-9999999",
+    "https://audio.yourcloudlibrary.com/listen/123",
+]
+TYPOS = [ "storytl", "bokbeat", "Nextori", "librivoxx", "everandscribdstorytel", "x" * 200 ]
+PART_COUNT = 10000
+
+
+def test_startup(benchmark):
+    result = benchmark(subprocess.run, [ sys.executable, "-c", STARTUP_CODE ], check = True)
+    assert result.returncode == 0
+
+
+def test_find_compatible_source(benchmark):
+    urls = URLS * 1000
+    benchmark.items = len(urls)
+    benchmark.unit = "urls"
+    results = benchmark(lambda: [ find_compatible_source(url) for url in urls ])
+    assert results[-1].__name__ == "YourCloudLibrarySource"
+
+
+def test_nearest_source_name(benchmark):
+    names = get_source_names()
+    typos = TYPOS * 10
+    benchmark.items = len(typos)
+    benchmark.unit = "names"
+    results = benchmark(lambda: [ nearest_string(typo, names) for typo in typos ])
+    assert results[:4] == [ "Storytel", "BookBeat", "Nextory", "Librivox" ]
+
+
+def test_overdrive_chapters(benchmark):
+    book_info = {
+        "spine": [ {"audio-duration": 600.5} for _ in range(PART_COUNT) ],
+        "nav": {
+            "toc": [
+                {"title": f"Chapter {i+1}", "path": f"{{ABC}}Fmt425-Part{i+1:05}.mp3#0"}
+                for i in range(PART_COUNT)
+            ]
+        }
+    }
+    chapters = benchmark(OverdriveSource.get_chapters, book_info)
+    assert len(chapters) == PART_COUNT
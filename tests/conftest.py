@@ -0,0 +1,21 @@
+from audiobookdl import Source
+
+from types import SimpleNamespace
+from typing import Callable, Type, TypeVar
+import pytest
+
+T = TypeVar("T", bound=Source)
+
+
+@pytest.fixture
+def options(tmp_path) -> SimpleNamespace:
+    """Cli options needed to create sources, with the database in `tmp_path`"""
+    return SimpleNamespace(database_directory=str(tmp_path), skip_downloaded=False)
+
+
+@pytest.fixture
+def create_source(options) -> Callable[[Type[T]], T]:
+    """Creates sources with `options`. Sources created in the same test share their database."""
+    def create(source_class: Type[T]) -> T:
+        return source_class(options)
+    return create
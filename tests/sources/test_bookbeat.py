@@ -0,0 +1,48 @@
+from audiobookdl.sources.bookbeat import BookBeatSource, SAVED_BOOKS_PAGE_SIZE
+
+import pytest
+
+BOOK_COUNT = 250
+
+
+@pytest.fixture
+def create_bookbeat(create_source):
+    def create() -> BookBeatSource:
+        source = create_source(BookBeatSource)
+        source._saved_books_snapshot = "saved_books_test"
+        return source
+    return create
+
+
+def fake_saved_books(requests: list, book_count: int):
+    def get_json(url, params):
+        requests.append(params)
+        offset, limit = params["offset"], params["limit"]
+        books = [ {"bookid": i} for i in range(offset, min(offset + limit, book_count)) ]
+        return {"_embedded": {"savedBooks": books}}
+    return get_json
+
+
+def test_saved_books_are_paginated(create_bookbeat):
+    source = create_bookbeat()
+    requests: list = []
+    source.get_json = fake_saved_books(requests, BOOK_COUNT)
+    saved_books = source.get_saved_books()
+    assert len(saved_books) == BOOK_COUNT
+    assert saved_books["249"]["bookid"] == 249
+    assert [ r["offset"] for r in requests ] == [0, SAVED_BOOKS_PAGE_SIZE, 2 * SAVED_BOOKS_PAGE_SIZE]
+
+
+def test_saved_books_snapshot(create_bookbeat):
+    requests: list = []
+    first = create_bookbeat()
+    first.get_json = fake_saved_books(requests, BOOK_COUNT)
+    first.get_saved_books()
+    requests.clear()
+    # A new source reads the stored list and only refreshes on a miss
+    second = create_bookbeat()
+    second.get_json = fake_saved_books(requests, BOOK_COUNT + 1)
+    assert "0" in second.get_saved_books()
+    assert requests == []
+    assert str(BOOK_COUNT) in second.get_saved_books(refresh=True)
+    assert len(requests) == 3
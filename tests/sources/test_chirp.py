@@ -0,0 +1,26 @@
+from audiobookdl.sources.chirp import ChirpSource
+
+import base64
+from Crypto.Cipher import AES
+
+KEY = b"0123456789abcdef"
+IV = base64.b64encode(b"xxxxxxxx1234")
+TRACKS = [ { "partNumber": 1, "chapterNumber": i, "displayName": f"Chapter {i}" } for i in range(3) ]
+
+
+def test_track_urls_are_resolved_before_download(create_source):
+    source = create_source(ChirpSource)
+    requests = []
+    def post_json(url, json, headers):
+        requests.append(json["variables"])
+        # Urls are padded with a single byte
+        media_url = f"https://cdn.chirpbooks.com/{json['variables']['chapterNumber']}.mp3".ljust(47, "x") + "\x01"
+        encrypted = AES.new(KEY, AES.MODE_CBC, IV).encrypt(media_url.encode())
+        return { "data": { "audiobook": { "track": { "webPlayerMediaUrl": base64.b64encode(encrypted) } } } }
+    source.post_json = post_json # type: ignore
+    files = source.get_files(1, KEY, IV, TRACKS)
+    assert requests == []
+    assert len({ file.url for file in files }) == len(TRACKS)
+    assert files[2].url_resolver is not None
+    assert files[2].url_resolver().startswith("https://cdn.chirpbooks.com/2.mp3")
+    assert requests == [ { "id": 1, "chapterNumber": 2, "partNumber": 1 } ]
@@ -0,0 +1,29 @@
+from audiobookdl.sources.nextory import NextorySource
+
+import pytest
+
+
+@pytest.fixture
+def create_nextory(create_source):
+    def create(book_count: int, downloads: list) -> NextorySource:
+        source = create_source(NextorySource)
+        source._wantlist_snapshot = "wantlist_test"
+        def download_want_to_read_list():
+            downloads.append(book_count)
+            return [ {"id": i, "formats": [ {"type": "hls"} ]} for i in range(book_count) ]
+        source.download_want_to_read_list = download_want_to_read_list # type: ignore
+        return source
+    return create
+
+
+def test_wantlist_listing_is_refreshed(create_nextory):
+    downloads: list = []
+    create_nextory(2, downloads)._get_wantlist()
+    # Single books are looked up in the stored list
+    source = create_nextory(3, downloads)
+    assert source.find_book_info(1)["id"] == 1
+    assert downloads == [2]
+    # Listing the want-to-read list includes books added since it was stored
+    series = source._download_wantlist()
+    assert [ book.id for book in series.books ] == [0, 1, 2]
+    assert downloads == [2, 3]
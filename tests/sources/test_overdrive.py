@@ -0,0 +1,25 @@
+from audiobookdl.sources.overdrive import OverdriveSource
+
+PART_COUNT = 10000
+PART_DURATION = 600.5
+
+
+def create_book_info() -> dict:
+    return {
+        "spine": [ {"audio-duration": PART_DURATION} for _ in range(PART_COUNT) ],
+        "nav": {
+            "toc": [
+                {"title": f"Chapter {i+1}", "path": f"{{ABC}}Fmt425-Part{i+1:05}.mp3#{i % 60}"}
+                for i in range(PART_COUNT)
+            ]
+        }
+    }
+
+
+def test_chapters_from_large_spine():
+    book_info = create_book_info()
+    chapters = OverdriveSource.get_chapters(book_info)
+    assert len(chapters) == PART_COUNT
+    assert chapters[0].start == 0
+    for i in (1, 59, 60, PART_COUNT - 1):
+        assert chapters[i].start == int((i * PART_DURATION + i % 60) * 1000)
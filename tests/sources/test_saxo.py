@@ -0,0 +1,56 @@
+from audiobookdl.sources.saxo import SaxoSource, METADATA_BATCH_SIZE
+
+import threading
+import time
+import pytest
+
+BOOK_COUNT = 120
+
+
+@pytest.fixture
+def source(create_source) -> SaxoSource:
+    source = create_source(SaxoSource)
+    source.bearer_token = "token"
+    source.user_id = "user"
+    return source
+
+
+def test_prefetch_batches_metadata(source):
+    metadata_requests = []
+    def get_json(url, headers):
+        isbn = url.split("/")[-1].split("?")[0]
+        return { "items": [ { "bookId": f"id{isbn}" } ] }
+    def post_json(url, headers, json):
+        metadata_requests.append(json)
+        return { "items": [ { "bookId": book_id, "title": book_id } for book_id in json ] }
+    source.get_json = get_json # type: ignore
+    source.post_json = post_json # type: ignore
+    urls = [ f"https://www.saxo.com/dk/book_{i}" for i in range(BOOK_COUNT) ]
+    source.prefetch(urls)
+    assert [ len(r) for r in metadata_requests ] == [METADATA_BATCH_SIZE, METADATA_BATCH_SIZE, BOOK_COUNT - 2 * METADATA_BATCH_SIZE]
+    assert source._get_book_metadata(source._search_for_book("7"))["title"] == "id7"
+    assert len(metadata_requests) == 3
+
+
+def test_stream_links_are_resolved_concurrently(source):
+    chapter_count = 40
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+    def get_json(url, headers):
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return { "link": f"https://cdn.saxo.com/{url.split('/')[-1]}" }
+    source.get_json = get_json # type: ignore
+    book_info = {
+        "bookId": "1",
+        "techInfo": { "chapters": [ { "fileName": f"{i}.mp3" } for i in range(chapter_count) ] }
+    }
+    files = source.get_files(book_info)
+    assert [ f.url for f in files ] == [ f"https://cdn.saxo.com/{i}.mp3" for i in range(chapter_count) ]
+    assert max_active > 1
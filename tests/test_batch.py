@@ -0,0 +1,118 @@
+from audiobookdl import args, batch
+from audiobookdl.exceptions import BookHasNoAudiobook, RequestError
+from audiobookdl.sources import find_compatible_source
+
+import argparse
+import json
+import threading
+import time
+import pytest
+
+STORYTEL_URLS = [ f"https://www.storytel.com/se/sv/books/book-{i}" for i in range(20) ]
+LIBRIVOX_URLS = [ f"https://librivox.org/book-{i}/" for i in range(20) ]
+
+
+@pytest.fixture
+def batch_options(options, tmp_path):
+    """Creates options with batch runner settings"""
+    def create(jobs: int, jobs_per_source: int = 1):
+        options.jobs = jobs
+        options.jobs_per_source = jobs_per_source
+        options.result_log = str(tmp_path / "results.jsonl")
+        return options
+    return create
+
+
+def test_batch_reuses_sources_and_limits_concurrency(batch_options):
+    options = batch_options(jobs=4, jobs_per_source=2)
+    created = []
+    def create_source(url):
+        created.append(url)
+        return find_compatible_source(url)(options)
+    lock = threading.Lock()
+    running = {}
+    max_running = {}
+    def process(url, source):
+        with lock:
+            running[source.name] = running.get(source.name, 0) + 1
+            max_running[source.name] = max(max_running.get(source.name, 0), running[source.name])
+        time.sleep(0.01)
+        with lock:
+            running[source.name] -= 1
+        if url.endswith("-1"):
+            raise RequestError
+        if url.endswith("-2"):
+            raise BookHasNoAudiobook
+        return not url.endswith("-3")
+    urls = STORYTEL_URLS + LIBRIVOX_URLS + ["https://example.com/book"]
+    results = batch.run(urls, options, create_source, process)
+    assert created == [ STORYTEL_URLS[0], LIBRIVOX_URLS[0] ]
+    assert max_running == { "storytel": 2, "librivox": 2 }
+    statuses = { r.url: r.status for r in results }
+    assert statuses["https://www.storytel.com/se/sv/books/book-0"] == batch.SUCCESS
+    assert statuses["https://www.storytel.com/se/sv/books/book-1"] == batch.FAILED
+    assert statuses["https://www.storytel.com/se/sv/books/book-2"] == batch.SKIPPED
+    assert statuses["https://www.storytel.com/se/sv/books/book-3"] == batch.SKIPPED
+    assert statuses["https://example.com/book"] == batch.FAILED
+    with open(options.result_log) as f:
+        logged = [ json.loads(line) for line in f ]
+    assert { r["url"]: r["status"] for r in logged } == statuses
+
+
+def test_batch_source_per_library(batch_options):
+    options = batch_options(jobs=1)
+    urls = [
+        "https://www.aakb.dk/work/work-of:870970-basis:1",
+        "https://aalborgbibliotekerne.dk/work/work-of:870970-basis:2",
+        "https://aakb.dk/work/work-of:870970-basis:3",
+    ]
+    created = []
+    def create_source(url):
+        created.append(url)
+        return find_compatible_source(url)(options)
+    used = {}
+    def process(url, source):
+        used[url] = source
+        return True
+    batch.run(urls, options, create_source, process)
+    # eReolen logins are per library
+    assert created == urls[:2]
+    assert used[urls[0]] is used[urls[2]]
+    assert used[urls[0]] is not used[urls[1]]
+
+
+def test_batch_failed_authentication(batch_options):
+    options = batch_options(jobs=1)
+    def create_source(url):
+        raise RequestError
+    results = batch.run(STORYTEL_URLS[:3], options, create_source, lambda url, source: True)
+    assert [ r.status for r in results ] == [batch.FAILED] * 3
+
+
+@pytest.mark.parametrize("jobs", [ 1, 4 ])
+def test_batch_unexpected_errors(batch_options, jobs):
+    options = batch_options(jobs=jobs)
+    def process(url, source):
+        if url.endswith("-1"):
+            raise KeyError("title")
+        return True
+    results = batch.run(STORYTEL_URLS[:4], options, lambda url: find_compatible_source(url)(options), process)
+    statuses = { r.url: (r.status, r.error) for r in results }
+    assert statuses[STORYTEL_URLS[1]] == (batch.FAILED, "KeyError")
+    assert statuses[STORYTEL_URLS[3]] == (batch.SUCCESS, None)
+    with open(options.result_log) as f:
+        assert len(f.readlines()) == 4
+
+
+def test_batch_interrupt(batch_options):
+    options = batch_options(jobs=1)
+    def process(url, source):
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        batch.run(STORYTEL_URLS[:2], options, lambda url: find_compatible_source(url)(options), process)
+
+
+@pytest.mark.parametrize("value", [ "0", "-1", "two" ])
+def test_invalid_job_count(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        args.positive_int(value)
@@ -0,0 +1,97 @@
+from audiobookdl import Audiobook, AudiobookFile, AudiobookMetadata
+from audiobookdl.exceptions import NotEnoughSpace
+from audiobookdl.output import download
+
+import http.server
+import os
+import shutil
+import threading
+from types import SimpleNamespace
+import pytest
+import requests
+
+FILE_SIZE = 5000
+
+
+class FileHandler(http.server.BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        # Urls starting with /expired act like expired signed urls
+        self.send_response(403 if self.path.startswith("/expired") else 200)
+        self.send_header("Content-type", "audio/mpeg")
+        self.send_header("Content-length", str(FILE_SIZE))
+        self.end_headers()
+
+    def do_GET(self):
+        self.do_HEAD()
+        self.wfile.write(b"x" * FILE_SIZE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def create_audiobook(server: str, file_count: int) -> Audiobook:
+    return Audiobook(
+        session = requests.Session(),
+        metadata = AudiobookMetadata("Book"),
+        files = [ AudiobookFile(url = f"{server}/{i}.mp3", ext = "mp3") for i in range(file_count) ],
+    )
+
+
+def test_estimate_download_size(server):
+    assert download.estimate_download_size(create_audiobook(server, 10)) == 10 * FILE_SIZE
+    # Large books are estimated from a sample
+    assert download.estimate_download_size(create_audiobook(server, 500)) == 500 * FILE_SIZE
+
+
+def test_not_enough_space(server, tmp_path, monkeypatch):
+    audiobook = create_audiobook(server, 10)
+    options = SimpleNamespace(output_format = None, combine = True)
+    free = 20 * FILE_SIZE
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: SimpleNamespace(free = free))
+    download.check_free_space(audiobook, str(tmp_path / "Book"), SimpleNamespace(output_format = None, combine = False))
+    with pytest.raises(NotEnoughSpace):
+        download.check_free_space(audiobook, str(tmp_path / "Book"), options)
+
+
+def test_download_file_is_not_padded(server, tmp_path):
+    audiobook = create_audiobook(server, 1)
+    path = download.download_file((audiobook, str(tmp_path / "Book"), 0, lambda progress: None))
+    with open(path, "rb") as f:
+        assert f.read() == b"x" * FILE_SIZE
+
+
+def test_resolved_url_is_used_first(server, tmp_path):
+    resolved = []
+    def resolve():
+        resolved.append(True)
+        return f"{server}/new.mp3"
+    responses = []
+    class Session(requests.Session):
+        def get(self, *args, **kwargs):
+            response = super().get(*args, **kwargs)
+            responses.append(response)
+            return response
+    def download_with_url(url: str, name: str) -> str:
+        audiobook = Audiobook(
+            session = Session(),
+            metadata = AudiobookMetadata(name),
+            files = [ AudiobookFile(url = url, ext = "mp3", url_resolver = resolve, url_is_resolved = True) ],
+        )
+        return download.download_file((audiobook, str(tmp_path / name), 0, lambda progress: None))
+    download_with_url(f"{server}/valid.mp3", "Valid")
+    assert resolved == []
+    # A new url is only requested when the url is rejected
+    path = download_with_url(f"{server}/expired.mp3", "Expired")
+    assert resolved == [ True ]
+    assert os.path.getsize(path) == FILE_SIZE
+    # The rejected response is closed
+    assert responses[1].status_code == 403
+    assert responses[1].raw.closed
@@ -0,0 +1,45 @@
+from audiobookdl.output.encryption import AESDecryptor, decrypt_file
+from audiobookdl.exceptions import DecryptionError
+from audiobookdl.utils.audiobook import AESEncryption
+
+import os
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+KEY = b"CD3E9D141D8EFC0886912E7A8F3652C4"
+IV = b"78CB354D377772F1"
+
+
+@pytest.mark.parametrize("chunk_sizes", [ [1], [7, 33], [16], [4096] ])
+def test_uneven_chunks(chunk_sizes):
+    plain = os.urandom(1000)
+    encrypted = AES.new(KEY, AES.MODE_CBC, IV).encrypt(pad(plain, AES.block_size))
+    decryptor = AESDecryptor(AESEncryption(KEY, IV, padding=True))
+    result = b""
+    offset = 0
+    index = 0
+    while offset < len(encrypted):
+        size = chunk_sizes[index % len(chunk_sizes)]
+        result += decryptor.update(encrypted[offset:offset+size])
+        offset += size
+        index += 1
+    result += decryptor.finalize()
+    assert result == plain
+
+
+def test_unpadded_stream_is_kept():
+    plain = os.urandom(64)
+    encrypted = AES.new(KEY, AES.MODE_CBC, IV).encrypt(plain)
+    decryptor = AESDecryptor(AESEncryption(KEY, IV))
+    assert decryptor.update(encrypted) + decryptor.finalize() == plain
+
+
+def test_truncated_file(tmp_path):
+    path = str(tmp_path / "file.mp3")
+    with open(path, "wb") as f:
+        f.write(os.urandom(100))
+    with pytest.raises(DecryptionError):
+        decrypt_file(path, AESEncryption(KEY, IV))
+    assert os.listdir(tmp_path) == [ "file.mp3" ]
+
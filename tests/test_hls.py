@@ -0,0 +1,127 @@
+from audiobookdl import Source
+from audiobookdl.sources.source.networking import _playlist_files
+from audiobookdl.output.encryption import decrypt_file
+
+import http.server
+import os
+import threading
+import tracemalloc
+from typing import List, Optional
+import m3u8
+import pytest
+import requests
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+
+KEY = b"0123456789abcdef"
+SEGMENT_COUNT = 500
+FIRST_MEDIA_SEQUENCE = 7
+
+
+def create_playlist(explicit_iv: bool, segment_count: int = SEGMENT_COUNT) -> m3u8.M3U8:
+    lines = [
+        "#EXTM3U",
+        f"#EXT-X-MEDIA-SEQUENCE:{FIRST_MEDIA_SEQUENCE}",
+        '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"' + (",IV=0x1F" if explicit_iv else ""),
+    ]
+    for index in range(segment_count):
+        lines.append("#EXTINF:10,")
+        lines.append(f"segments/{index}.ts")
+    lines.append("#EXT-X-ENDLIST")
+    return m3u8.loads("\n".join(lines), uri="https://example.com/book/playlist.m3u8")
+
+
+def test_media_sequence_iv():
+    files = _playlist_files(create_playlist(False), {"https://example.com/book/key.bin": KEY}, {}, None, None)
+    assert files[0].url == "https://example.com/book/segments/0.ts"
+    assert files[0].ext == "ts"
+    assert files[0].encryption_method.iv == FIRST_MEDIA_SEQUENCE.to_bytes(16, "big")
+    assert files[3].encryption_method.iv == (FIRST_MEDIA_SEQUENCE + 3).to_bytes(16, "big")
+
+
+def test_explicit_iv_is_shared():
+    files = _playlist_files(create_playlist(True), {"https://example.com/book/key.bin": KEY}, {}, None, None)
+    assert files[0].encryption_method.iv == (31).to_bytes(16, "big")
+    assert all(f.encryption_method is files[0].encryption_method for f in files)
+
+
+def test_decrypt_segments(tmp_path):
+    files = _playlist_files(create_playlist(False), {"https://example.com/book/key.bin": KEY}, {}, None, None)
+    segments = []
+    for index, file in enumerate(files):
+        content = os.urandom(4096)
+        path = os.path.join(tmp_path, f"{index}.ts")
+        cipher = AES.new(KEY, AES.MODE_CBC, file.encryption_method.iv)
+        with open(path, "wb") as f:
+            f.write(cipher.encrypt(pad(content, AES.block_size)))
+        segments.append((path, content))
+    for file, (path, _) in zip(files, segments):
+        decrypt_file(path, file.encryption_method)
+    for path, content in segments:
+        with open(path, "rb") as f:
+            assert f.read() == content
+
+
+def test_segment_memory():
+    segment_count = 50000
+    playlist = create_playlist(False, segment_count)
+    headers = {"User-Agent": "audiobook-dl"}
+    tracemalloc.start()
+    files = _playlist_files(playlist, {"https://example.com/book/key.bin": KEY}, headers, None, None)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(files) == segment_count
+    assert all(f.headers is headers for f in files)
+    assert all(f.encryption_method.key is files[0].encryption_method.key for f in files)
+    assert used / segment_count < 512
+
+
+class PlaylistHandler(http.server.BaseHTTPRequestHandler):
+    """Serves an encrypted playlist and its key and records authorization headers"""
+    authorizations: List[Optional[str]] = []
+
+    def do_GET(self):
+        self.authorizations.append(self.headers.get("Authorization"))
+        if self.path == "/key.bin":
+            content = KEY
+        else:
+            content = "\n".join([
+                "#EXTM3U",
+                '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"',
+                "#EXTINF:10,",
+                "segments/0.ts",
+                "#EXT-X-ENDLIST",
+            ]).encode()
+        self.send_response(200)
+        self.send_header("Content-length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class StreamSource(Source):
+    names = [ "Stream" ]
+
+
+@pytest.fixture
+def playlist_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PlaylistHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    PlaylistHandler.authorizations = []
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_stream_files_with_session(playlist_server, create_source):
+    source = create_source(StreamSource)
+    source._session.headers["Authorization"] = "Bearer token"
+    files = source.get_stream_files(f"{playlist_server}/playlist.m3u8")
+    assert PlaylistHandler.authorizations == [ "Bearer token" ] * 2
+    assert files[0].encryption_method.key == KEY
+    # Hosts rejecting the login of the source get requests without it
+    PlaylistHandler.authorizations.clear()
+    files = source.get_stream_files(f"{playlist_server}/playlist.m3u8", session=source._download_session)
+    assert PlaylistHandler.authorizations == [ None ] * 2
+    assert files[0].url == f"{playlist_server}/segments/0.ts"
@@ -0,0 +1,113 @@
+from audiobookdl import AudiobookMetadata, Chapter, Cover, metrics
+from audiobookdl.output.metadata import ffmpeg, id3, add_metadata_to_files
+
+import io
+import os
+import subprocess
+import time
+from multiprocessing.pool import ThreadPool
+from mutagen.id3 import ID3
+
+# MPEG-1 Layer III frame at 128 kbit/s and 44.1 kHz
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+MP3_FRAME_COUNT = 2000
+
+
+def create_mp3(path) -> str:
+    with open(path, "wb") as f:
+        f.write(MP3_FRAME * MP3_FRAME_COUNT)
+    return str(path)
+
+
+def test_chapter_file_with_many_chapters(tmp_path):
+    filepath = create_mp3(tmp_path / "book.mp3")
+    chapter_count = 10000
+    chapters = [ Chapter(i * 5, f"Chapter {i+1}") for i in range(chapter_count) ]
+    output = io.StringIO()
+    ffmpeg.write_tmp_chapter_file(output, filepath, chapters)
+    text = output.getvalue()
+    assert text.startswith(";FFMETADATA1\n[CHAPTER]")
+    assert text.count("[CHAPTER]") == chapter_count
+    assert "START=5\nEND=10\ntitle=Chapter 2" in text
+    # Last chapter ends at the end of the file
+    last_end = int(text.rsplit("END=", 1)[1].split("\n")[0])
+    assert abs(last_end - MP3_FRAME_COUNT * 1152 / 44.1) < 1000
+
+
+def test_write_id3(tmp_path):
+    filepath = create_mp3(tmp_path / "book.mp3")
+    metadata = AudiobookMetadata("Title", authors = ["Author"], narrators = ["Narrator"], series = "Series")
+    chapters = [ Chapter(i * 10000, f"Chapter {i+1}") for i in range(5) ]
+    cover = Cover(b"image", "jpg")
+    id3.write_id3(filepath, metadata, chapters, cover)
+    tags = ID3(filepath)
+    assert tags["TIT2"].text == ["Title"]
+    assert tags["TPE1"].text == ["Author"]
+    assert tags["TALB"].text == ["Series"]
+    assert tags["APIC:"].data == b"image"
+    assert tags["CTOC:toc"].child_element_ids == [ f"chp{i}" for i in range(1, 6) ]
+    assert tags["CHAP:chp5"].start_time == 40000
+    assert abs(tags["CHAP:chp5"].end_time - MP3_FRAME_COUNT * 1152 / 44.1) < 1000
+    # Audio data is kept and does not move when tags change later
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        assert f.read().endswith(MP3_FRAME * MP3_FRAME_COUNT)
+    id3.write_id3(filepath, AudiobookMetadata("A longer title than before"))
+    assert os.path.getsize(filepath) == size
+    assert ID3(filepath)["TIT2"].text == ["A longer title than before"]
+
+
+def test_tag_many_parts(tmp_path):
+    part_count = 600
+    filepaths = []
+    for i in range(part_count):
+        path = tmp_path / f"Part {i:03}.mp3"
+        with open(path, "wb") as f:
+            f.write(MP3_FRAME * 10)
+        filepaths.append(str(path))
+    titles = [ f"Part {i+1}" if i % 2 == 0 else None for i in range(part_count) ]
+    metadata = AudiobookMetadata("Book", authors = ["Author"])
+    add_metadata_to_files(filepaths, metadata, titles)
+    first, second = ID3(filepaths[0]), ID3(filepaths[1])
+    assert first["TIT2"].text == ["Part 1"]
+    assert second["TIT2"].text == ["Book"]
+    assert first["TPE1"].text == second["TPE1"].text == ["Author"]
+
+
+def test_metadata_snapshot():
+    metadata = AudiobookMetadata("Title", authors = ["Author"])
+    snapshot = metadata.snapshot()
+    assert metadata.snapshot() is snapshot
+    assert snapshot.template["author"] == "Author"
+    assert snapshot.json == metadata.as_json().encode()
+    metadata.add_author("Second author")
+    assert metadata.snapshot().template["author"] == "Author; Second author"
+    metadata.series = "Series"
+    assert ("series", "Series") in metadata.snapshot().tags
+    metadata.genres = ["Fantasy"]
+    assert metadata.snapshot().template["genre"] == "Fantasy"
+    assert metadata == AudiobookMetadata("Title", series = "Series", authors = ["Author", "Second author"], genres = ["Fantasy"])
+    # Lists can only be changed by replacing them
+    assert metadata.authors == ("Author", "Second author")
+
+
+def test_parallel_ffmpeg_chapters(tmp_path, monkeypatch):
+    def run_program(command, **kwargs):
+        # Fake ffmpeg copying input and chapter file to the output
+        input_path, chapter_path, output_path = command[3], command[5], command[-1]
+        time.sleep(0.01)
+        with open(input_path, "rb") as source, open(chapter_path, "rb") as chapters, open(output_path, "wb") as f:
+            f.write(source.read() + chapters.read())
+        return subprocess.CompletedProcess(command, 0)
+    monkeypatch.setattr(metrics, "run_program", run_program)
+    filepaths = [ create_mp3(tmp_path / f"book{i}.mp3") for i in range(8) ]
+    with ThreadPool(8) as pool:
+        pool.map(
+            lambda i: ffmpeg.add_chapters_ffmpeg(filepaths[i], [ Chapter(0, f"Book {i}") ]),
+            range(len(filepaths))
+        )
+    for i, filepath in enumerate(filepaths):
+        with open(filepath, "rb") as f:
+            assert f"title=Book {i}\n".encode() in f.read()
+    # Temporary files are removed
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in filepaths)
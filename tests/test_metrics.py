@@ -0,0 +1,78 @@
+from audiobookdl import metrics
+
+import json
+import os
+import sys
+from multiprocessing.pool import ThreadPool
+
+
+def test_counters_and_histograms():
+    collector = metrics.Metrics()
+    collector.increment("download_bytes_total", 1000, (("host", "example.com"),))
+    collector.increment("download_bytes_total", 500, (("host", "example.com"),))
+    collector.increment("download_seconds_total", 0.5, (("host", "example.com"),))
+    for value in (0.005, 0.2, 100):
+        collector.observe("http_request_seconds", value, (("host", "example.com"),))
+    result = collector.as_dict()
+    assert result["counters"][0] == {
+        "name": "download_bytes_total",
+        "labels": { "host": "example.com" },
+        "value": 1500
+    }
+    histogram = result["histograms"][0]
+    assert histogram["count"] == 3
+    assert histogram["buckets"]["0.01"] == 1
+    assert histogram["buckets"]["0.25"] == 1
+    assert histogram["overflow"] == 1
+    assert result["download_speed"] == { "example.com": 3000 }
+
+
+def test_scopes_in_thread_pool():
+    with metrics.scope() as book:
+        with metrics.scope() as part:
+            with ThreadPool(4) as pool:
+                pool.map(metrics.in_current_scope(lambda _: metrics.increment("test_total")), range(10))
+        metrics.increment("test_total")
+    # Threads outside the scope are not measured in it
+    with ThreadPool(4) as pool:
+        pool.map(lambda _: metrics.increment("test_total"), range(10))
+    assert part.counters == { ("test_total", ()): 10 }
+    assert book.counters == { ("test_total", ()): 11 }
+    assert metrics.registry.counters[("test_total", ())] >= 21
+
+
+def test_subprocess_and_exports(tmp_path):
+    with metrics.scope() as book:
+        with metrics.phase("convert"):
+            metrics.run_program([sys.executable, "-c", "pass"])
+    program = os.path.basename(sys.executable)
+    assert book.counters[("subprocess_runs_total", (("program", program),))] == 1
+    assert book.counters[("phase_seconds_total", (("phase", "convert"),))] > 0
+    summary_path = tmp_path / "metrics.jsonl"
+    metrics.write_summary(str(summary_path), "Book", book)
+    summary = json.loads(summary_path.read_text())
+    assert summary["title"] == "Book"
+    textfile_path = tmp_path / "audiobookdl.prom"
+    metrics.write_textfile(str(textfile_path))
+    text = textfile_path.read_text()
+    assert 'audiobookdl_phase_seconds_total{phase="convert"}' in text
+
+
+def test_prometheus_histogram_is_cumulative():
+    collector = metrics.Metrics()
+    for value in (0.005, 0.2, 100):
+        collector.observe("http_request_seconds", value, (("host", 'a"b'),))
+    collector.observe("http_request_seconds", 1, (("host", "example.com"),))
+    collector.increment("download_bytes_total", 10, (("host", "a"),))
+    collector.increment("download_bytes_total", 20, (("host", "b"),))
+    lines = collector.prometheus_text().splitlines()
+    # Every metric has one type line before its series
+    assert [ line for line in lines if line.startswith("#") ] == [
+        "# TYPE audiobookdl_download_bytes_total counter",
+        "# TYPE audiobookdl_http_request_seconds histogram",
+    ]
+    assert lines[0] == "# TYPE audiobookdl_download_bytes_total counter"
+    assert 'audiobookdl_http_request_seconds_bucket{host="a\\"b",le="0.01"} 1' in lines
+    assert 'audiobookdl_http_request_seconds_bucket{host="a\\"b",le="30.0"} 2' in lines
+    assert 'audiobookdl_http_request_seconds_bucket{host="a\\"b",le="+Inf"} 3' in lines
+    assert 'audiobookdl_http_request_seconds_count{host="a\\"b"} 3' in lines
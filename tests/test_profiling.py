@@ -0,0 +1,47 @@
+from audiobookdl import metrics, profiling
+
+import json
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+
+@profiling.traced()
+def work():
+    time.sleep(0.01)
+
+
+def test_profiling_disabled(monkeypatch):
+    monkeypatch.setattr(profiling, "enabled", False)
+    profiling.clear()
+    with profiling.span("process_url"):
+        work()
+    assert profiling.trace_events()["traceEvents"] == []
+
+
+def test_profiling_spans(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "enabled", True)
+    profiling.clear()
+    with profiling.span("process_url", url="https://example.com"):
+        with metrics.phase("download"):
+            with ThreadPool(2) as pool:
+                pool.map(metrics.in_current_scope(lambda _: work()), range(4))
+        metrics.run_program([sys.executable, "-c", "sum(range(10**6))"])
+    events = profiling.trace_events()["traceEvents"]
+    spans = [ event for event in events if event["ph"] == "X" ]
+    assert [ event["name"] for event in spans ].count("work") == 4
+    root = next(event for event in spans if event["name"] == "process_url")
+    assert root["args"] == { "url": "https://example.com" }
+    program = next(event for event in spans if event["name"].startswith("python"))
+    assert program["args"]["returncode"] == 0
+    assert program["args"]["cpu_seconds"] > 0
+    # Spans in thread pool are nested under the span that started the pool
+    stacks = {
+        line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1])
+        for line in profiling.collapsed_stacks().splitlines()
+    }
+    assert stacks["process_url;download;work"] >= 4 * 10_000
+    assert stacks["process_url;download"] < stacks["process_url;download;work"]
+    path = tmp_path / "trace.json"
+    profiling.write(str(path))
+    assert json.loads(path.read_text())["traceEvents"] == events
@@ -0,0 +1,80 @@
+from audiobookdl.sources import SOURCES, find_compatible_source
+from audiobookdl.exceptions import NoSourceFound
+
+import re
+import subprocess
+import sys
+from typing import List
+from urllib.parse import urlsplit
+import pytest
+
+
+def test_registry_matches_sources():
+    for entry in SOURCES:
+        source = entry.load()
+        assert source.__name__ == entry.class_name
+        assert source.names == entry.names
+        assert source.match == entry.match
+
+
+def loaded_modules(code: str) -> List[str]:
+    """
+    Run `code` in a new interpreter
+
+    :returns: Modules loaded after `code` is run
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys\nprint('\\n'.join(sys.modules))"],
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout.splitlines()
+
+
+def test_startup_imports_matching_source_only():
+    modules = loaded_modules(
+        "from audiobookdl.sources import find_compatible_source\n"
+        "find_compatible_source('https://www.storytel.com/se/sv/books/shantaram-1404854')"
+    )
+    assert "audiobookdl.sources.storytel" in modules
+    for entry in SOURCES:
+        if entry.module != "storytel":
+            assert f"audiobookdl.sources.{entry.module}" not in modules
+    assert "lxml.html" not in modules
+
+
+URLS = [
+    "https://www.audiobooks.com/book/stream/413879",
+    "https://www.bookbeat.no/bok/somethingsomething-999999",
+    "https://www.chirpbooks.com/player/11435746",
+    "https://aalborgbibliotekerne.dk/work/work-of:870970-basis:12345678",
+    "https://www.aakb.dk/work/work-of:870970-basis:12345678",
+    "https://librivox.org/library-of-the-worlds-best-literature-ancient-and-modern-volume-3-by-various/",
+    "https://ofs-d2b6150a9dec641552f953da2637d146.listen.overdrive.com/?d=...",
+    "https://open.podimo.com/podcast/some-podcast",
+    "https://www.saxo.com/dk/some-book_9788711111111",
+    "https://www.scribd.com/listen/579426746",
+    "https://www.storytel.com/no/nn/books/somethingsomething-9999999",
+    "https://audio.yourcloudlibrary.com/listen/123",
+]
+
+
+def find_source_by_loop(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    for entry in SOURCES:
+        if entry.hosts is not None and host.removeprefix("www.") not in entry.hosts():
+            continue
+        for m in entry.match:
+            if re.match(m, url):
+                return entry.class_name
+    raise NoSourceFound
+
+
+def test_url_matcher():
+    results = [ find_compatible_source(url).__name__ for url in URLS ]
+    assert results == [ find_source_by_loop(url) for url in URLS ]
+
+
+def test_ereolen_host_lookup():
+    assert find_compatible_source("https://www.aakb.dk/work/work-of:870970-basis:1").__name__ == "EreolenSource"
+    with pytest.raises(NoSourceFound):
+        find_compatible_source("https://example.com/work/work-of:870970-basis:1")
@@ -0,0 +1,136 @@
+from audiobookdl import __main__ as cli
+from audiobookdl.config import Config
+from audiobookdl.exceptions import UserNotAuthorized
+from audiobookdl.sources.source.token_store import TokenStore
+from audiobookdl.sources.saxo import SaxoSource
+from audiobookdl.sources.storytel import StorytelSource
+
+import os
+import stat
+import pytest
+
+IDENTITY = { "username": "user@example.com" }
+
+
+def test_stored_login_roundtrip(tmp_path):
+    store = TokenStore(str(tmp_path))
+    store.save("saxo", IDENTITY, {"token": "secret"}, max_age=60)
+    assert store.load("saxo", IDENTITY) == {"token": "secret"}
+    assert store.load("saxo", { "username": "other@example.com" }) is None
+    assert store.load("storytel", IDENTITY) is None
+    # Entries are only readable by the current user
+    entries = os.listdir(tmp_path / "saxo")
+    assert stat.S_IMODE(os.stat(tmp_path / "saxo").st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(tmp_path / "saxo" / entries[0]).st_mode) == 0o600
+    store.update("saxo", IDENTITY, {"token": "refreshed"})
+    assert store.load("saxo", IDENTITY) == {"token": "refreshed"}
+    store.delete("saxo", IDENTITY)
+    assert store.load("saxo", IDENTITY) is None
+    # Only existing logins are updated
+    store.update("saxo", IDENTITY, {"token": "refreshed"})
+    assert store.load("saxo", IDENTITY) is None
+
+
+def test_stored_login_expires(tmp_path):
+    store = TokenStore(str(tmp_path))
+    store.save("saxo", IDENTITY, {"token": "secret"}, max_age=-1)
+    assert store.load("saxo", IDENTITY) is None
+
+
+def test_restore_source_login(create_source, options):
+    source = create_source(SaxoSource)
+    source._login = lambda url, username, password: setattr(source, "bearer_token", "token") # type: ignore
+    source._session.headers.update({"X-Test": "1"})
+    source._session.cookies.set("session", "abc", domain="saxo.com", path="/")
+    source.login("https://www.saxo.com", username=IDENTITY["username"], password="password")
+    restored = create_source(SaxoSource)
+    assert not restored.restore_login(username="other@example.com")
+    assert restored.restore_login(**IDENTITY)
+    assert restored.authenticated
+    assert restored.login_restored
+    assert restored.bearer_token == "token"
+    assert restored._session.headers["X-Test"] == "1"
+    assert restored._session.cookies.get("session", domain="saxo.com") == "abc"
+    options.no_token_cache = True
+    assert not create_source(SaxoSource).restore_login(**IDENTITY)
+
+
+def test_storytel_password_is_not_stored(create_source, tmp_path):
+    source = create_source(StorytelSource)
+    def _login(url, username, password):
+        source._url = url
+        source._username = username
+        source._password = source.encrypt_password(password)
+        source._language = "sv"
+    source._login = _login # type: ignore
+    source.login("https://www.storytel.com", username=IDENTITY["username"], password="password")
+    for root, _, files in os.walk(tmp_path):
+        for name in files:
+            with open(os.path.join(root, name)) as f:
+                content = f.read()
+            assert source._password not in content
+    # Login is refreshed with a password from the user
+    restored = create_source(StorytelSource)
+    assert restored.restore_login(**IDENTITY)
+    assert restored._password is None
+    logins = []
+    restored._do_login = lambda: logins.append(restored._password) # type: ignore
+    restored._download_counter = 10
+    with pytest.raises(UserNotAuthorized):
+        restored._relogin_check()
+    restored.ask_password = lambda: "password"
+    restored._relogin_check()
+    assert logins == [ source._password ]
+
+
+def test_storytel_download_counter_is_stored(create_source):
+    source = create_source(StorytelSource)
+    def _login(url, username, password):
+        source._url = url
+        source._username = username
+        source._language = "sv"
+    source._login = _login # type: ignore
+    source.login("https://www.storytel.com", username=IDENTITY["username"], password="password")
+    source._download_counter = 9
+    source._update_stored_login()
+    # The next run logs in again before its first download
+    restored = create_source(StorytelSource)
+    assert restored.restore_login(**IDENTITY)
+    assert restored._download_counter == 9
+    restored._download_counter += 1
+    restored._update_stored_login()
+    logins = []
+    restored = create_source(StorytelSource)
+    assert restored.restore_login(**IDENTITY)
+    restored._do_login = lambda: logins.append(restored._password) # type: ignore
+    restored.ask_password = lambda: "password"
+    restored._relogin_check()
+    assert len(logins) == 1
+
+
+def test_rejected_stored_login(create_source, options, tmp_path, monkeypatch):
+    source = create_source(SaxoSource)
+    source._login = lambda url, username, password: setattr(source, "bearer_token", "token") # type: ignore
+    source.login("https://www.saxo.com", username=IDENTITY["username"], password="password")
+    restored = create_source(SaxoSource)
+    assert restored.restore_login(**IDENTITY)
+    logins = []
+    def login(url, source, options, config, restore = True):
+        logins.append(restore)
+        source.bearer_token = "new token"
+    monkeypatch.setattr(cli, "login", login)
+    def download_result(url, source, options):
+        if source.bearer_token == "token":
+            raise UserNotAuthorized
+        return True
+    monkeypatch.setattr(cli, "download_result", download_result)
+    assert cli.process_result("https://www.saxo.com/dk/book", restored, options, Config({}, None, None, None))
+    assert logins == [ False ]
+    assert not restored.login_restored
+    assert TokenStore(str(tmp_path)).load("saxo", IDENTITY) is None
+    # Errors are not retried if the login was not restored
+    source = create_source(SaxoSource)
+    source.bearer_token = "token"
+    with pytest.raises(UserNotAuthorized):
+        cli.process_result("https://www.saxo.com/dk/book", source, options, Config({}, None, None, None))
+    assert logins == [ False ]
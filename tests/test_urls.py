@@ -4,7 +4,7 @@ TEST_DATA = {
     "https://www.audiobooks.com/book/stream/413879": "Audiobooksdotcom",
     "https://www.audiobooks.com/browse/library": "Audiobooksdotcom",
     "https://www.bookbeat.no/bok/somethingsomething-999999": "BookBeat",
-    "https://ereolen.dk/ting/object/870970-basis%3A53978223": "Ereolen",
+    "https://www.aakb.dk/work/work-of:870970-basis:53978223": "Ereolen",
     "https://www.everand.com/listen/579426746": "Everand",
     "https://www.chirpbooks.com/player/11435746": "Chirp",
     "https://librivox.org/library-of-the-worlds-best-literature-ancient-and-modern-volume-3-by-various/": "Librivox",
@@ -0,0 +1,25 @@
+from audiobookdl.utils import levenstein_distance, nearest_string
+from audiobookdl.sources import get_source_names
+
+
+def test_levenstein_distance():
+    assert levenstein_distance("", "") == 0
+    assert levenstein_distance("kitten", "sitting") == 3
+    assert levenstein_distance("sitting", "kitten") == 3
+    assert levenstein_distance("flaw", "lawn") == 2
+    assert levenstein_distance("abc", "") == 3
+
+
+def test_levenstein_distance_cut_off():
+    assert levenstein_distance("kitten", "sitting", max_distance=1) == 2
+    assert levenstein_distance("a", "a" * 100, max_distance=5) == 6
+    assert levenstein_distance("kitten", "sitting", max_distance=3) == 3
+
+
+def test_nearest_source_name():
+    names = get_source_names()
+    typos = [ "storytl", "bokbeat", "Nextori", "librivoxx", "everandscribdstorytel", "x" * 200 ]
+    results = [ nearest_string(typo, names) for typo in typos ]
+    assert results[:4] == [ "Storytel", "BookBeat", "Nextory", "Librivox" ]
+    for typo, result in zip(typos, results):
+        assert result == min(names, key = lambda x: levenstein_distance(typo, x))